@@ -1,5 +1,25 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import ChainMap, OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
 from PIL import Image, ImageDraw, ImageFont
 
+# POSIX shared memory (not available on Windows)
+try :
+	import _posixshmem
+
+except ImportError :
+	_posixshmem = None
+
 TERMINAL_LOGS = False
 
 # Colour values
@@ -7,6 +27,22 @@ RGBA_TRANSPARENT = (0, 0, 0, 0)
 RGBA_BACKGROUND  = (255, 255, 255, 255)
 RGBA_TEXT        = (0, 0, 0, 255)
 
+# Max memory taken by images of lines cached by create_img_of_sentence()
+LINE_IMG_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Changes whenever the layout of SharedGlyphCache in shared memory changes
+# Processes using different versions then don't attach to each other's caches
+SHARED_GLYPH_CACHE_VERSION = 1
+
+# Characters warmed up by SharedGlyphCache by default
+# Arabic Presentation Forms-B (shaped alphabets) and Arabic punctuation
+SHARED_GLYPH_CACHE_ALPHABETS = [chr(i) for i in range(0xFE80, 0xFEFD)] + ['،', '؛', '؟']
+SHARED_GLYPH_CACHE_VOWELS    = ['َ', 'ْ', 'ُ', 'ٌ', 'ً', 'ّ', 'ِ', 'ٍ']
+
+# Unicode blocks indexed as bitmaps by GlyphCoverageIndex
+# Arabic, Arabic Supplement, Arabic Extended-A, Arabic Presentation Forms-A and B
+ARABIC_BLOCKS = [(0x0600, 0x06FF), (0x0750, 0x077F), (0x08A0, 0x08FF), (0xFB50, 0xFDFF), (0xFE70, 0xFEFF)]
+
 def calculate_box_to_crop_out_whitespace_from_img(img, margin = 1, debug = False) :
 	
 	# Removes most unnecessary pixels (whitespace) from image
@@ -62,6 +98,213 @@ def calculate_box_to_crop_out_whitespace_from_img(img, margin = 1, debug = False
 
 	return (left, top, right, bottom)
 
+def calculate_sha256_of_file(file_path) :
+
+	file_hash = hashlib.sha256()
+
+	with open(file_path, "rb") as f :
+		for chunk in iter(lambda : f.read(1 << 16), b"") :
+			file_hash.update(chunk)
+
+	return file_hash.hexdigest()
+
+# Hashed once per version of a font file
+# ... = {(font path, time modified, size) : SHA-256}
+ALL_FONT_SHA256 = {}
+
+def get_sha256_of_font(font_path) :
+
+	font_stat = os.stat(font_path)
+	key       = (font_path, font_stat.st_mtime_ns, font_stat.st_size)
+
+	if key not in ALL_FONT_SHA256 :
+		ALL_FONT_SHA256[key] = calculate_sha256_of_file(font_path)
+
+	return ALL_FONT_SHA256[key]
+
+# First 4 bytes of fonts whose character map can be read (TrueType, OpenType and Apple TrueType)
+# Collections (.ttc) start with b"ttcf"
+SFNT_SIGNATURES = [b"\x00\x01\x00\x00", b"OTTO", b"true", b"typ1"]
+
+class UnsupportedFontFormatError(ValueError) :
+
+	# Raised when the character map of a font can't be read (i.e. WOFF and WOFF2 fonts, which are compressed)
+	# PIL can still draw with these fonts, only glyph coverage and fallback fonts need the character map
+	pass
+
+def read_characters_of_font(font_path, font_index = 0) :
+
+	# Returns the set of unicode values that the font maps to a glyph (i.e. its character map, "cmap" table)
+	# Reads the font file directly, PIL doesn't expose the character map
+
+	with open(font_path, "rb") as f :
+		font_bytes = f.read()
+
+	if (font_bytes[: 4] not in SFNT_SIGNATURES) and (font_bytes[: 4] != b"ttcf") :
+		raise UnsupportedFontFormatError(f"Unsupported font format {font_bytes[: 4]!r} of font {font_path}, glyph coverage can only be checked for TrueType/OpenType fonts (.ttf, .otf, .ttc)")
+
+	# Font collection (.ttc), same font_index as ImageFont.truetype()
+	font_offset = 0
+
+	if font_bytes[: 4] == b"ttcf" :
+		font_offset = struct.unpack_from(">I", font_bytes, 12 + (4 * font_index))[0]
+
+	# Finds the "cmap" table in the table directory
+	n_tables   = struct.unpack_from(">H", font_bytes, font_offset + 4)[0]
+	cmap_start = None
+
+	for i in range(n_tables) :
+		tag, _, table_offset, _ = struct.unpack_from(">4sIII", font_bytes, font_offset + 12 + (16 * i))
+
+		if tag == b"cmap" :
+			cmap_start = table_offset
+			break
+
+	if cmap_start is None :
+		raise ValueError(f"Font {font_path} has no character map")
+
+	# Finds the best subtable
+	# Full unicode (format 12) is preferred over the basic multilingual plane only (format 4)
+	n_subtables = struct.unpack_from(">H", font_bytes, cmap_start + 2)[0]
+	subtables   = {}
+
+	for i in range(n_subtables) :
+		platform_id, encoding_id, subtable_offset = struct.unpack_from(">HHI", font_bytes, cmap_start + 4 + (8 * i))
+		subtable_start  = cmap_start + subtable_offset
+		subtable_format = struct.unpack_from(">H", font_bytes, subtable_start)[0]
+
+		# Unicode platform or Windows unicode encodings
+		if (platform_id == 0) or ((platform_id == 3) and (encoding_id in [1, 10])) :
+			subtables.setdefault(subtable_format, subtable_start)
+
+	characters = set()
+
+	if 12 in subtables :
+		subtable_start = subtables[12]
+		n_groups       = struct.unpack_from(">I", font_bytes, subtable_start + 12)[0]
+
+		for i in range(n_groups) :
+			start_char, end_char, start_glyph = struct.unpack_from(">III", font_bytes, subtable_start + 16 + (12 * i))
+
+			# Glyph 0 is the "missing glyph" (tofu)
+			if start_glyph == 0 :
+				start_char = start_char + 1
+
+			characters.update(range(start_char, end_char + 1))
+
+	elif 4 in subtables :
+		subtable_start = subtables[4]
+		seg_count      = struct.unpack_from(">H", font_bytes, subtable_start + 6)[0] // 2
+
+		end_codes_start        = subtable_start + 14
+		start_codes_start      = end_codes_start + (2 * seg_count) + 2
+		id_deltas_start        = start_codes_start + (2 * seg_count)
+		id_range_offsets_start = id_deltas_start + (2 * seg_count)
+
+		for i in range(seg_count) :
+			end_code        = struct.unpack_from(">H", font_bytes, end_codes_start + (2 * i))[0]
+			start_code      = struct.unpack_from(">H", font_bytes, start_codes_start + (2 * i))[0]
+			id_delta        = struct.unpack_from(">h", font_bytes, id_deltas_start + (2 * i))[0]
+			id_range_offset = struct.unpack_from(">H", font_bytes, id_range_offsets_start + (2 * i))[0]
+
+			for c in range(start_code, end_code + 1) :
+
+				# Last segment only maps 0xFFFF to the missing glyph
+				if c == 0xFFFF :
+					continue
+
+				if id_range_offset == 0 :
+					glyph_id = (c + id_delta) & 0xFFFF
+
+				else :
+					glyph_id = struct.unpack_from(">H", font_bytes, id_range_offsets_start + (2 * i) + id_range_offset + (2 * (c - start_code)))[0]
+
+					if glyph_id :
+						glyph_id = (glyph_id + id_delta) & 0xFFFF
+
+				if glyph_id :
+					characters.add(c)
+
+	else :
+		raise ValueError(f"Font {font_path} has no unicode character map (format 4 or 12)")
+
+	return characters
+
+class GlyphCoverageIndex :
+
+	# Which characters a font can draw (i.e. not drawn as tofu)
+	# Built once per font from its character map
+
+	# Arabic blocks are stored as a bitmap (1 bit per character)
+	# Characters outside of these blocks (spaces, punctuation, latin, ...) are stored in a set
+
+	def __init__(self, font_path, font_index = 0) :
+
+		self.font_path = font_path
+
+		characters = read_characters_of_font(font_path, font_index = font_index)
+
+		# Offset of the first bit of each block in the bitmap
+		self.blocks = []
+		n_bits      = 0
+
+		for block_start, block_end in ARABIC_BLOCKS :
+			self.blocks.append((block_start, block_end, n_bits))
+			n_bits += block_end - block_start + 1
+
+		self.bitmap = bytearray((n_bits + 7) // 8)
+
+		for block_start, block_end, bit_offset in self.blocks :
+			for c in range(block_start, block_end + 1) :
+				if c in characters :
+					bit = bit_offset + (c - block_start)
+					self.bitmap[bit >> 3] |= 1 << (bit & 7)
+
+		self.other_characters = frozenset(c for c in characters if not any(block_start <= c <= block_end for block_start, block_end in ARABIC_BLOCKS))
+
+	def covers(self, character) :
+
+		c = ord(character)
+
+		# Constant number of blocks
+		for block_start, block_end, bit_offset in self.blocks :
+			if block_start <= c <= block_end :
+				bit = bit_offset + (c - block_start)
+				return bool(self.bitmap[bit >> 3] & (1 << (bit & 7)))
+
+		return c in self.other_characters
+
+	def find_uncovered_characters(self, text) :
+
+		# Unique characters not covered by the font (in the order they appear in text)
+		return [i for i in dict.fromkeys(text) if not self.covers(i)]
+
+# Built once per font
+# ... = {(font path, font index) : GlyphCoverageIndex}
+ALL_GLYPH_COVERAGE_INDEX = {}
+
+def get_glyph_coverage_index(font_path, font_index = 0) :
+
+	key = (font_path, font_index)
+
+	if key not in ALL_GLYPH_COVERAGE_INDEX :
+		ALL_GLYPH_COVERAGE_INDEX[key] = GlyphCoverageIndex(font_path, font_index = font_index)
+
+	return ALL_GLYPH_COVERAGE_INDEX[key]
+
+def find_uncovered_characters(text, font_path, fallback_font_path = None) :
+
+	# Characters of text that neither the font nor the fallback font can draw
+	# Only reads character maps, nothing is drawn
+
+	uncovered = get_glyph_coverage_index(font_path).find_uncovered_characters(text)
+
+	if fallback_font_path is not None :
+		fallback_coverage = get_glyph_coverage_index(fallback_font_path)
+		uncovered         = [i for i in uncovered if not fallback_coverage.covers(i)]
+
+	return uncovered
+
 def calculate_wh_and_bbox_of_rendered_text(text, font, anchor = None, debug = False) :
 
 	# Anchor is dependent on font being used
@@ -94,6 +337,53 @@ def calculate_wh_and_bbox_of_rendered_text(text, font, anchor = None, debug = Fa
 
 	return ((text_w, text_h), text_bbox)
 
+class VowelTooSmallToCropError(ValueError) :
+
+	# Raised when the image of a vowel is too small to be cropped (i.e. the font size is too small)
+	# Subclass of ValueError, which Image.crop() raised before
+	pass
+
+def create_img_of_vowel(vowel, font, anchor = None, debug = False) :
+
+	# Calculates the width and height of each vowel when drawn
+	(text_w, text_h), (left, top, right, bottom) = calculate_wh_and_bbox_of_rendered_text(text = vowel, font = font, anchor = anchor, debug = debug)
+
+	# Creates images for each unique vowel
+	vowel_img = Image.new("RGBA", (text_w, text_h), RGBA_TRANSPARENT)
+	draw_img  = ImageDraw.Draw(vowel_img)
+
+	# Draws character with an offset
+
+	# Shift character from (left, top) to (0, 0)
+	# Since the width and height of the image = the width and height of the character,
+	# An image of only the character is created with minimal whitespace
+
+	# This shift works well for alphabets but not so much for vowels
+	# Because vowels have a lot of whitespace in the character/unicode itself
+
+	draw_img.text(
+		xy   = (- left, - top),
+		text = vowel,
+		font = font,
+		fill = RGBA_TEXT
+		)
+
+	if debug :
+		print(f"Creating image of text\nText          = {vowel}\nWidth, Height = {text_w, text_h}\nx, y          = {- left, - top}\n")
+
+	# Images of vowels are cropped to remove whitespace
+	# Because some fonts draw vowels with whitespace and others without
+	# The images are thus cropped as a standard
+
+	# Crops image of vowel
+	box = calculate_box_to_crop_out_whitespace_from_img(img = vowel_img, debug = debug)
+
+	# No pixel of the vowel was found (i.e. at very small font sizes)
+	if (box[2] < box[0]) or (box[3] < box[1]) :
+		raise VowelTooSmallToCropError(f"Vowel {vowel} has no pixels to crop to at font size {font.size}")
+
+	return vowel_img.crop(box = box)
+
 class ArabicWord :
 
 	# Arabic characters usually have UTF-8 encoding
@@ -108,8 +398,14 @@ class ArabicWord :
 	VOWELS_UP   = ['َ', 'ْ', 'ُ', 'ٌ', 'ً', 'ّ']
 	VOWELS_DOWN = ['ِ', 'ٍ']
 
-	def __init__(self, word_string, font_path = None, font_size = 12, specific_vowel_offset = {}, img_background_rgba = RGBA_BACKGROUND, cached_unique_alphabets_wh_and_bbox = {}, cached_unique_vowels_img = {}, debug = False) :
+	def __init__(self, word_string, font_path = None, font_size = 12, specific_vowel_offset = {}, img_background_rgba = RGBA_BACKGROUND, cached_unique_alphabets_wh_and_bbox = {}, cached_unique_vowels_img = {}, create_img = True, fallback_font_path = None, check_glyph_coverage = False, debug = False) :
 		
+		# When create_img is False, only the layout is calculated (i.e. word_img_wh and baseline)
+		# And word_img is None
+
+		# Characters that the font can't draw are drawn with the fallback font (if any)
+		# When check_glyph_coverage is True, characters that neither font can draw raise a ValueError before anything is drawn
+
 		self.word_string         = word_string
 		self.img_background_rgba = img_background_rgba
 		self.__debug             = debug
@@ -123,6 +419,18 @@ class ArabicWord :
 		self.font      = ImageFont.truetype(font_path, font_size)
 		self.font_size = font_size
 
+		self.check_glyph_coverage = check_glyph_coverage
+		self.fallback_font        = None
+		self.coverage             = None
+		self.fallback_coverage    = None
+
+		if (fallback_font_path is not None) or check_glyph_coverage :
+			self.coverage = get_glyph_coverage_index(font_path)
+
+		if fallback_font_path is not None :
+			self.fallback_font     = ImageFont.truetype(fallback_font_path, font_size)
+			self.fallback_coverage = get_glyph_coverage_index(fallback_font_path)
+
 		# Creates the image of the arabic word by calling methods
 
 		# Seperates alphabets and vowels (tokenizes word)
@@ -235,31 +543,51 @@ class ArabicWord :
 		# Increases total height as a safety
 		word_img_h = int(1.2 * word_img_h)
 
-		if self.__debug :
-			print(f"----------\nCreating Word Image\n\nWidth, Height = {word_img_w, word_img_h}\n")
-
-		# Creates image
-		word_img = Image.new("RGBA", (word_img_w, word_img_h), self.img_background_rgba)
-		draw_img = ImageDraw.Draw(word_img)
-
-		# Draws alphabets
-		draw_img.text(
-			xy   = self.alphabets_xy[0],
-			text = "".join(i for i in self.alphabets),
-			font = self.font,
-			fill = RGBA_TEXT
-			)
+		self.word_img_wh = (word_img_w, word_img_h)
+		self.word_img    = None
 
-		# Pastes vowels
-		for i, vowels_for_this_alphabet in enumerate(self.vowels) :
-			for j, v in enumerate(vowels_for_this_alphabet)  :
-				word_img.paste(self.unique_vowels_img[v], self.vowels_xy[i][j], mask = self.unique_vowels_img[v])
+		if create_img :
+
+			if self.__debug :
+				print(f"----------\nCreating Word Image\n\nWidth, Height = {word_img_w, word_img_h}\n")
+
+			# Creates image
+			word_img = Image.new("RGBA", (word_img_w, word_img_h), self.img_background_rgba)
+			draw_img = ImageDraw.Draw(word_img)
+
+			# Draws alphabets
+			# (One run of text per font, see split_alphabets_into_runs_by_font())
+			run_x, run_y = self.alphabets_xy[0]
+			runs         = self.split_alphabets_into_runs_by_font(self.alphabets)
+
+			for i, (run_text, run_font) in enumerate(runs) :
+				draw_img.text(
+					xy   = (run_x, run_y),
+					text = run_text,
+					font = run_font,
+					fill = RGBA_TEXT
+					)
 
-		self.word_img = word_img
+				# Next run starts where this one ends
+				if i < len(runs) - 1 :
+					run_x += calculate_wh_and_bbox_of_rendered_text(text = run_text, font = run_font)[0][0]
+
+			# Pastes vowels
+			for i, vowels_for_this_alphabet in enumerate(self.vowels) :
+				for j, v in enumerate(vowels_for_this_alphabet)  :
+					word_img.paste(self.unique_vowels_img[v], self.vowels_xy[i][j], mask = self.unique_vowels_img[v])
+
+			self.word_img = word_img
 
 		# Determines baseline of image of the word
 		self.determine_baseline_of_word_img()
 
+	@staticmethod
+	def is_vowel(character) :
+
+		# Arabic vowels unicode values usually start with b'\xd9\...'
+		return str(character.encode(ArabicWord.ENCODING))[3 : 6] in ["xd9"]
+
 	def tokenize_word(self) :
 
 		if self.__debug :
@@ -271,15 +599,27 @@ class ArabicWord :
 		self.alphabets = []
 		self.vowels    = []
 
+		# Filled only when the coverage of the font is checked
+		self.characters_drawn_with_fallback_font = set()
+		self.uncovered_characters                = []
+
 		# Stores vowels corresponding to the current alphabet
 		# i.e. vowels_for_alphabets[-1] throughout iteration
 		vowels_for_this_alphabet = []
 
 		for i in self.word_string :
 
+			# Character is missing from the font
+			if (self.coverage is not None) and (not self.coverage.covers(i)) :
+
+				if (self.fallback_coverage is not None) and self.fallback_coverage.covers(i) :
+					self.characters_drawn_with_fallback_font.add(i)
+
+				elif i not in self.uncovered_characters :
+					self.uncovered_characters.append(i)
+
 			# Vowel
-			# Arabic vowels unicode values usually start with b'\xd9\...'
-			if str(i.encode(ArabicWord.ENCODING))[3 : 6] in ["xd9"] :
+			if ArabicWord.is_vowel(i) :
 				vowels_for_this_alphabet.append(i)
 
 			# Alphabet
@@ -295,6 +635,49 @@ class ArabicWord :
 			# Removes [] from vowels
 			print(f"Word has {len(self.alphabets)} alphabets and {len([i for i in self.vowels if i])} vowels\n")
 
+			if self.characters_drawn_with_fallback_font or self.uncovered_characters :
+				print(f"Drawn with fallback font = {sorted(self.characters_drawn_with_fallback_font)}\nNot covered by any font  = {self.uncovered_characters}\n")
+
+		# Reported before any pixel work
+		if self.check_glyph_coverage and self.uncovered_characters :
+			raise ValueError(f"Font can't draw characters {self.uncovered_characters} of word {self.word_string}")
+
+	def font_for_character(self, character) :
+
+		if character in self.characters_drawn_with_fallback_font :
+			return self.fallback_font
+
+		return self.font
+
+	def split_alphabets_into_runs_by_font(self, alphabets) :
+
+		# Consecutive alphabets drawn with the same font are drawn together (so that they are joined correctly)
+		# ... = [(text, font), ...]
+		# Without a fallback font, this is always a single run
+
+		runs = []
+
+		for a in alphabets :
+			font = self.font_for_character(a)
+
+			if runs and (runs[-1][1] is font) :
+				runs[-1] = (runs[-1][0] + a, font)
+
+			else :
+				runs.append((a, font))
+
+		return runs
+
+	def calculate_w_of_alphabets(self, alphabets) :
+
+		# Width of alphabets when drawn together (one run of text per font)
+		w = 0
+
+		for run_text, run_font in self.split_alphabets_into_runs_by_font(alphabets) :
+			w += calculate_wh_and_bbox_of_rendered_text(text = run_text, font = run_font, debug = self.__debug)[0][0]
+
+		return w
+
 	def calculate_xy_and_wh_of_each_alphabet(self, offset_x = 0, offset_y = 0) :
 		
 		if self.__debug :
@@ -313,7 +696,7 @@ class ArabicWord :
 			# When not using the cache system, all alphabets will be processed
 
 			if i not in self.unique_alphabets_wh_and_bbox :
-				self.unique_alphabets_wh_and_bbox[i] = calculate_wh_and_bbox_of_rendered_text(text = i, font = self.font, debug = self.__debug)
+				self.unique_alphabets_wh_and_bbox[i] = calculate_wh_and_bbox_of_rendered_text(text = i, font = self.font_for_character(i), debug = self.__debug)
 
 		# Calculates where each alphabet will be drawn
 		# i.e. (left, top)
@@ -332,7 +715,7 @@ class ArabicWord :
 			# Hence, calculating the x (left) value based on the individual width of each alphabets will not work
 			# Because it does not take into account how the font handles/draws the alphabets together
 
-			a_x = offset_x + (calculate_wh_and_bbox_of_rendered_text(text = "".join(j for j in self.alphabets[:i]), font = self.font, debug = self.__debug))[0][0]
+			a_x = offset_x + self.calculate_w_of_alphabets(self.alphabets[:i])
 
 			# Y will usually be constant for all alphabets
 			# Y will later be changed depending on what vowels are pasted on top of alphabets and the height that they occupy
@@ -362,39 +745,7 @@ class ArabicWord :
 				
 				# Image for this vowel does not exist
 				if v not in self.unique_vowels_img :
-
-					# Calculates the width and height of each vowel when drawn
-					(text_w, text_h), (left, top, right, bottom) = calculate_wh_and_bbox_of_rendered_text(text = v, font = self.font, anchor = anchor, debug = self.__debug)
-
-					# Creates images for each unique vowel
-					vowel_img = Image.new("RGBA", (text_w, text_h), RGBA_TRANSPARENT)
-					draw_img  = ImageDraw.Draw(vowel_img)
-
-					# Draws character with an offset
-
-					# Shift character from (left, top) to (0, 0)
-					# Since the width and height of the image = the width and height of the character,
-					# An image of only the character is created with minimal whitespace
-
-					# This shift works well for alphabets but not so much for vowels
-					# Because vowels have a lot of whitespace in the character/unicode itself
-
-					draw_img.text(
-						xy   = (- left, - top),
-						text = v,
-						font = self.font,
-						fill = RGBA_TEXT
-						)
-
-					if self.__debug :
-						print(f"Creating image of text\nText          = {v}\nWidth, Height = {text_w, text_h}\nx, y          = {- left, - top}\n")
-
-					# Images of vowels are cropped to remove whitespace
-					# Because some fonts draw vowels with whitespace and others without
-					# The images are thus cropped as a standard
-
-					# Crops image of vowel
-					self.unique_vowels_img[v] = vowel_img.crop(box = calculate_box_to_crop_out_whitespace_from_img(img = vowel_img, debug = self.__debug))
+					self.unique_vowels_img[v] = create_img_of_vowel(vowel = v, font = self.font_for_character(v), anchor = anchor, debug = self.__debug)
 
 	def calculate_xy_of_each_vowel_dependent_of_alphabet(self, alphabet_vowel_gap_y) :
 
@@ -530,7 +881,7 @@ class ArabicWord :
 		baseline_bottom = min([self.unique_alphabets_wh_and_bbox[a][1][3] for a in self.alphabets]) + self.shift_y_by
 
 		# Leftmost and rightmost values are given by the width of the image of the word
-		self.baseline = (0, baseline_top, self.word_img.size[0] - 1, baseline_bottom)
+		self.baseline = (0, baseline_top, self.word_img_wh[0] - 1, baseline_bottom)
 
 		if self.__debug :
 			print(f"Baseline = {self.baseline}\n")
@@ -593,209 +944,1402 @@ class ArabicWord :
 
 		self.debug_img = debug_img
 
-def create_img_of_sentence(sentence_string, font_path, font_size = 12, seperator = " ", n_lines = 1, align = "R", line_spacing = 0, create_debug_img = False, debug = False) :
+class LineImgCache :
 
-	# Note that sentence_string should have already been correctly shaped
+	# Bounded cache of images of lines (composed by create_img_of_line())
+	# Documents often contain identical lines (forms, templates, repeated headers)
+	# These lines are then only composed once
 
-	# Splits string into words
-	# Reverses the list because the actual start of the string is at the end
-	sentence_words = sentence_string.split(seperator)[::-1]
-	
-	# Note that here, the text is still LTR
+	# Key = (words in line, font path, font size, seperator, create_debug_img, fallback font path)
+	# Least recently used images are removed once the images take more than max_bytes
 
-	# Creating image of a sentence/phrase by pasting images of words together
-	arabic_word_obj = []
+	def __init__(self, max_bytes = LINE_IMG_CACHE_MAX_BYTES) :
 
-	# Uses a cache system to speed up the process
-	cached_unique_alphabets_wh_and_bbox = {}
-	cached_unique_vowels_img   = {}
-
-	for i in sentence_words :
-
-		# Inits ArabicWord object
-		obj = ArabicWord(
-			word_string                = i,
-			font_path                  = font_path,
-			font_size                  = font_size,
-			img_background_rgba        = RGBA_TRANSPARENT,
-			cached_unique_alphabets_wh_and_bbox = cached_unique_alphabets_wh_and_bbox,
-			cached_unique_vowels_img   = cached_unique_vowels_img,
-			debug                      = debug
-			)
+		self.max_bytes = max_bytes
 
-		# Builds cache for alphabets' dimensions
-		for j in obj.unique_alphabets_wh_and_bbox :
+		# ... = {key : image of line}
+		self.line_img = OrderedDict()
+		self.n_bytes  = 0
 
-			# Dimensions for a new alphabet was calculated
-			if j not in cached_unique_alphabets_wh_and_bbox :
-				cached_unique_alphabets_wh_and_bbox[j] = obj.unique_alphabets_wh_and_bbox[j]
+		self.hits      = 0
+		self.misses    = 0
+		self.evictions = 0
 
-		# Builds cache for images of vowels
-		for j in obj.unique_vowels_img :
+		# Images of sentences may be created from multiple threads
+		self.__lock = threading.Lock()
 
-			# Image for a new vowel was created
-			if j not in obj.unique_vowels_img :
-				cached_unique_vowels_img[j] = obj.unique_vowels_img[j]
+	@staticmethod
+	def calculate_n_bytes_of_img(img) :
 
-		# Creates images of words with bounding boxed
-		if create_debug_img :
-			obj.show_bounding_boxes_in_img()
-		
-		arabic_word_obj.append(obj)
+		# Images of lines are always "RGBA" (4 bytes per pixel)
+		return img.size[0] * img.size[1] * len(img.getbands())
 
-	# Assigns which word is in what line
-	if n_lines != 1 :
-		arabic_word_obj_per_line = []
-		n_words_per_line         = len(arabic_word_obj) // n_lines
+	def get(self, key) :
 
-		for i in range(n_lines) :
-			arabic_word_obj_per_line.append(arabic_word_obj[i * n_words_per_line : (i + 1) * n_words_per_line])
+		with self.__lock :
+			line_img = self.line_img.get(key)
 
-		# Appending "leftovers"
-		# Because some words are skipped due to integer division (rounding)
-		arabic_word_obj_leftover = arabic_word_obj[n_lines * n_words_per_line : -1] + [arabic_word_obj[-1]]
+			if line_img is None :
+				self.misses += 1
+				return None
 
-		if (len(arabic_word_obj) % n_lines) :
-			arabic_word_obj_per_line[-1] = arabic_word_obj_per_line[-1] + arabic_word_obj_leftover
+			# Most recently used is kept at the end
+			self.line_img.move_to_end(key)
+			self.hits += 1
 
-	else :
-		arabic_word_obj_per_line = [arabic_word_obj]
+			return line_img
 
-	# Finds the width taken by a " "
-	space_w = calculate_wh_and_bbox_of_rendered_text(text = seperator, font = ImageFont.truetype(font_path, font_size))[0][0]
+	def put(self, key, line_img) :
 
-	# Creates images of each line
-	all_line_img = []
+		n_bytes = LineImgCache.calculate_n_bytes_of_img(line_img)
 
-	for i, obj_in_this_line in enumerate(arabic_word_obj_per_line) :
-		
-		# Reverses each line to convert text from LTR to RTL
-		obj_in_this_line = obj_in_this_line[::-1]
+		# Would evict everything else and still not fit
+		if n_bytes > self.max_bytes :
+			return
+
+		with self.__lock :
+			if key in self.line_img :
+				self.n_bytes -= LineImgCache.calculate_n_bytes_of_img(self.line_img.pop(key))
+
+			self.line_img[key] = line_img
+			self.n_bytes      += n_bytes
+
+			# Removes least recently used images
+			while self.n_bytes > self.max_bytes :
+				_, evicted_img = self.line_img.popitem(last = False)
+				self.n_bytes  -= LineImgCache.calculate_n_bytes_of_img(evicted_img)
+				self.evictions += 1
+
+	def clear(self) :
+
+		with self.__lock :
+			self.line_img.clear()
+			self.n_bytes = 0
+
+	def stats(self) :
+
+		n_lookups = self.hits + self.misses
+
+		return {
+			"hits"      : self.hits,
+			"misses"    : self.misses,
+			"hit_rate"  : (self.hits / n_lookups) if n_lookups else 0.0,
+			"evictions" : self.evictions,
+			"n_lines"   : len(self.line_img),
+			"n_bytes"   : self.n_bytes,
+			"max_bytes" : self.max_bytes,
+		}
+
+# Used by default by create_img_of_sentence()
+DEFAULT_LINE_IMG_CACHE = LineImgCache()
+
+class SharedGlyphMetrics(Mapping) :
 
-		# Extracts all the widths and heights seperately for calculations later on
-		all_obj_w = [j.word_img.size[0] for j in obj_in_this_line]
-		all_obj_h = [j.word_img.size[1] for j in obj_in_this_line]
+	# Read-only {alphabet : ((width, height), (left, top, right, bottom))} stored in shared memory
+	# Records are sorted by character, so alphabets are found by binary search (nothing is copied per process)
 
-		# The image of the word is slightly bigger than the actual space (width and height) occupied by the word in the image
-		# Since the baseline for every word is determined by the tallest word
-		# Words with alphabets that are drawn below the baseline (i.e 'ﻦ', 'ﻲ') will be favoured over others (i.e 'ﻈ')
+	# Record = (character, width, height, left, top, right, bottom)
+	RECORD = struct.Struct("<I6i")
 
-		# Baseline is thus increased by a tiny percentage
-		# So that words that have tall alphabets (going up) don't have their vowels cut (most likely when they have 2)
+	def __init__(self, buf) :
 
-		# Finds the tallest alphabet in the tallest word (max height) that goes below the baseline
-		# i.e Bottom of alphabet > Bottom of baseline
-		lowest_baseline = max([j.baseline[3] for j in obj_in_this_line])
+		self.buf = buf
+		self.n   = len(buf) // SharedGlyphMetrics.RECORD.size
 
-		# Creates image for this line
-		line_w   = sum(all_obj_w) + (len(obj_in_this_line) * space_w)
-		line_h   = max(all_obj_h)
-		line_img = Image.new("RGBA", (line_w, line_h), RGBA_TRANSPARENT)
+	def find(self, character) :
 
-		# Pastes images of words in this line together
-		for j, obj in enumerate(obj_in_this_line) :
-			obj_x = sum(all_obj_w[:j]) + (len(all_obj_w[:j]) * space_w)
+		# Returns the index of the record of this character (or -1)
+		if (not isinstance(character, str)) or (len(character) != 1) :
+			return -1
 
-			# Shifts image on y-axis to match/align baseline
-			obj_y = lowest_baseline - obj.baseline[3]
+		codepoint = ord(character)
+		lo, hi    = 0, self.n - 1
 
-			# Uses image of word with bounding boxes drawn
-			if create_debug_img :
-				img_to_paste = obj.debug_img
+		while lo <= hi :
+			mid           = (lo + hi) // 2
+			mid_codepoint = struct.unpack_from("<I", self.buf, mid * SharedGlyphMetrics.RECORD.size)[0]
+
+			if mid_codepoint == codepoint :
+				return mid
+
+			elif mid_codepoint < codepoint :
+				lo = mid + 1
 
 			else :
-				img_to_paste = obj.word_img
+				hi = mid - 1
 
-			# Pastes image of word onto the image of the line
-			line_img.paste(img_to_paste, (obj_x, obj_y), mask = img_to_paste)
+		return -1
 
-		all_line_img.append(line_img)
-	
-	# Width of all the text is equal to (=) the width of the longest image amongst the images of the lines
-	sentence_w = max([i.size[0] for i in all_line_img])
-	
-	all_line_h = [i.size[1] for i in all_line_img]
-	sentence_h = sum(all_line_h) + (len(all_line_img) * line_spacing)
+	def __getitem__(self, character) :
 
-	# Creates image of the whole text/sentence by pasting images of lines together
-	sentence_img = Image.new("RGBA", (sentence_w, sentence_h), RGBA_BACKGROUND)
+		i = self.find(character)
 
-	# Pastes images of lines together to form the sentence
-	for i, line_img in enumerate(all_line_img) :
+		if i < 0 :
+			raise KeyError(character)
 
-		# Centers text
-		if align.upper() == "C" :
-			line_x = (sentence_w - line_img.size[0]) // 2
+		_, w, h, left, top, right, bottom = SharedGlyphMetrics.RECORD.unpack_from(self.buf, i * SharedGlyphMetrics.RECORD.size)
 
-		# Aligns text to the left
-		elif align.upper() == "L" :
-			line_x = 0
+		return ((w, h), (left, top, right, bottom))
 
-		# Aligns text to the right
-		else :
-			line_x = sentence_w - line_img.size[0]
+	def __contains__(self, character) :
 
-		line_y = sum(all_line_h[:i]) + (i * line_spacing)
+		return self.find(character) >= 0
 
-		sentence_img.paste(line_img, (line_x, line_y), mask = line_img)
+	def __iter__(self) :
 
-	return sentence_img
+		for i in range(self.n) :
+			yield chr(struct.unpack_from("<I", self.buf, i * SharedGlyphMetrics.RECORD.size)[0])
 
-if __name__ == "__main__" :
+	def __len__(self) :
 
-	# These are prerequisites before using the class and its methods
+		return self.n
 
-	# Connects alphabets to each other correctly (shapes alphabets)
-	import arabic_reshaper
+	def release(self) :
 
-	arabic_reshaper_config = {
-		"delete_harakat"         : False,
-		"shift_harakat_position" : False,
-		"delete_tatweel"         : True
-	}
+		self.buf.release()
+		self.n = 0
 
-	reshaper = arabic_reshaper.ArabicReshaper(configuration = arabic_reshaper_config)
+class UntrackedSharedMemory(shared_memory.SharedMemory) :
 
-	# Right to Left orientation
-	from bidi.algorithm import get_display
+	# POSIX shared memory that is never registered with the resource tracker
+	# i.e. shared_memory.SharedMemory(track = False) for Python < 3.13
 
-	# PIL font parameters
-	font_path = "path to locally installed font (.ttf)"
-	font_size = 64
+	# Registering and unregistering right away isn't enough
+	# Processes started with spawn share one resource tracker, which prints a KeyError when a name is unregistered twice
 
-	# Correctly shapes text
-	text_unshaped     = u"لَكِنَّ لَا بَدَّ أَنَّ أوْضَحَ لَكَ أَنَّ كُلُّ هَذِهِ الْأَفْكَارِ الْمَغْلُوطَةِ حَوْلَ اِسْتِنْكَارِ النَّشْوَةٌ وَتَمْجيدِ الْألَمِ نَشَّأَتٍ بِالْفِعْلِ، وَسَأَعْرُضُ لَكَ التَّفَاصِيلُ لِتَكْتَشِفٌ حَقِيقَةٌ وَأَسَاسٍ تِلْكَ السَّعَادَةً الْبَشَرِيَّةِ، فَلَا أحَدٌ يَرْفُضُ أَوْ يَكْرَهُ أَوْ يَتَجَنَّبُ الشُّعُورٌ بِالسَّعَادَةِ، وَلَكِنَّ بِفَضْلِ هَؤُلَاءِ الْأَشْخَاصِ الَّذِينَ لَا يُدْرِكُونَ بِأَنَّ السَّعَادَةً لَا بَدَّ أَنَّ نَسْتَشْعِرُهَا بِصُورَةِ أَكْثَرِ عَقْلَانِيَّةٍ وَمِنْطَقِيَّةٍ فَيَعْرُضُهُمْ هَذَا لِمُوَاجَهَةُ الظُّروفآ الْألِيمَةِ، وَأُكَرِّرُ بِأَنَّهُ لَا يُوجَدُ مَنْ يَرْغَبُ فِي الْحُبِّ وَنَيْلِ الْمَنَالِ وَيَتَلَذَّذُ بِالْآلَاَمِ، الْألَمَ هُوَ الْألَمُ وَلَكِنَّ نَتِيجَةً لِظُروفٍ مَا قَدْ تَكْمُنُ السعاده فِيمَا نَتَحَمَّلُهُ مِنْ كَدٍّ وَأُسِّيٍّ."
-	text_shaped       = get_display(reshaper.reshape(text_unshaped), base_dir = "R")
-	text_shaped_words = text_shaped.split(" ")
+	def __init__(self, name, create = False, size = 0) :
 
-	# How to use the class and its methods
+		self._name  = "/" + name
+		self._flags = (os.O_CREAT | os.O_EXCL | os.O_RDWR) if create else os.O_RDWR
+		self._fd    = _posixshmem.shm_open(self._name, self._flags, mode = self._mode)
 
-	# Inits object
-	arabic_word = ArabicWord(
-		word_string = text_shaped_words[45],
-		font_path   = font_path,
-		font_size   = font_size,
-		debug       = TERMINAL_LOGS
-		)
+		try :
+			if create and size :
+				os.ftruncate(self._fd, size)
 
-	# The image of the arabic word is created when the ArabicWord object is initialised
-	# Attribute word_img is a PIL Image object
-	arabic_word.word_img.show()
+			self._size = os.fstat(self._fd).st_size
 
-	# Draws bounding boxes for validation
-	arabic_word.show_bounding_boxes_in_img()
-	arabic_word.debug_img.show()
+			# ValueError = "cannot mmap an empty file"
+			self._mmap = mmap.mmap(self._fd, self._size)
 
-	# Creating image of a sentence
-	sentence_img = create_img_of_sentence(
-		sentence_string      = text_shaped,
-		n_lines              = 10,
-		font_path            = font_path,
-		font_size            = font_size,
-		align                = "R",
-		line_spacing         = 10,
-		create_debug_img     = False,
-		debug                = TERMINAL_LOGS
-		)	
+		except (OSError, ValueError) :
+			os.close(self._fd)
+			self._fd = -1
+
+			if create :
+				_posixshmem.shm_unlink(self._name)
+
+			raise
+
+		self._buf = memoryview(self._mmap)
+
+	def unlink(self) :
+
+		_posixshmem.shm_unlink(self._name)
+
+class SharedGlyphCache :
+
+	# Cache of alphabets' dimensions and images of vowels (per font and font size) shared between processes
+	# The first process warms up the cache and publishes it in shared memory
+	# The other processes attach to it (read-only) instead of warming up their own copy
+
+	# Pass it to create_img_of_sentence() (glyph_cache = ...) for the font and font size it was created with
+	# Characters that weren't warmed up are still calculated, but only in this process
+
+	# Shared memory layout:
+	# [header][length of index][index (JSON)][pixels of images of vowels]
+
+	# Header = (magic, version, state, length of payload, CRC32 of payload)
+	HEADER = struct.Struct("<4sIIQI")
+	MAGIC  = b"AWGC"
+
+	# Memory of a new segment is zeroed, so a segment is "writing" until the owner marks it as "ready"
+	STATE_WRITING = 0
+	STATE_READY   = 1
+
+	def __init__(self, font_path, font_size = 12, alphabets = SHARED_GLYPH_CACHE_ALPHABETS, vowels = SHARED_GLYPH_CACHE_VOWELS, timeout = 10.0, shared = True, debug = False) :
+
+		# When shared is False, the cache is warmed up in this process only (i.e. like without shared memory)
+
+		self.font_path = font_path
+		self.font_size = font_size
+		self.alphabets = alphabets
+		self.vowels    = vowels
+		self.__debug   = debug
+
+		# Versioned by the hash of the font file
+		# A font that changed (same path) then gets a new segment
+		self.font_sha256 = get_sha256_of_font(font_path)
+
+		# Also versioned by the glyphs warmed up
+		# A cache of other glyphs (same font and font size) then gets a new segment
+		self.glyphs_sha256 = hashlib.sha256(("".join(alphabets) + "\0" + "".join(vowels)).encode(ArabicWord.ENCODING)).hexdigest()
+
+		# Kept short, some platforms (macOS) limit the length of names to 31 characters
+		self.name      = f"awgc{SHARED_GLYPH_CACHE_VERSION}_{self.font_sha256[:10]}_{font_size}_{self.glyphs_sha256[:6]}"
+		self.lock_name = f"{self.name}_l"
+
+		self.unique_alphabets_wh_and_bbox = {}
+		self.unique_vowels_img            = {}
+
+		# "owner"    = warmed up and published the cache
+		# "attached" = uses the cache published by another process
+		# "local"    = warmed up its own copy (owner died or didn't publish in time)
+		self.role      = None
+		self.warm_up_s = 0.0
+
+		self.__shm      = None
+		self.__lock_shm = None
+
+		t = time.perf_counter()
+
+		if not shared :
+			self.warm_up()
+			self.role = "local"
+
+		# Already published
+		elif self.attach() :
+			self.role = "attached"
+
+		else :
+
+			# Second attempt only happens when the owner died before publishing (its lock is then removed)
+			for _ in range(2) :
+				try :
+
+					# Only one process can create the lock (i.e. become the owner)
+					self.__lock_shm = SharedGlyphCache.open_shared_memory(name = self.lock_name, create = True, size = 8)
+					self.__lock_shm.buf[: 8] = struct.pack("<Q", os.getpid())
+
+				except FileExistsError :
+					self.__lock_shm = None
+
+				if self.__lock_shm is not None :
+					self.warm_up()
+
+					if self.publish() :
+						self.role = "owner"
+						break
+
+				# Another process is warming up the cache
+				if self.wait_and_attach(timeout = timeout) :
+					self.role = "attached"
+					break
+
+				# Timed out while the owner is still alive
+				if self.find_owner_pid() is not None :
+					break
+
+			if self.role is None :
+				if not self.unique_alphabets_wh_and_bbox :
+					self.warm_up()
+
+				self.role = "local"
+
+		self.warm_up_s = time.perf_counter() - t
+
+		if self.__debug :
+			print(f"----------\nShared Glyph Cache\n\nName   = {self.name}\nRole   = {self.role}\nTime   = {self.warm_up_s:.4f} s\nGlyphs = {len(self.unique_alphabets_wh_and_bbox)} alphabets, {len(self.unique_vowels_img)} vowels\n")
+
+	@staticmethod
+	def open_shared_memory(name, create = False, size = 0) :
+
+		# Segments are only removed by unlink() of the owner
+		# By default, Python removes segments when the process that opened them exits
+		try :
+			return shared_memory.SharedMemory(name = name, create = create, size = size, track = False)
+
+		# Python < 3.13 always registers the segment with the resource tracker (on POSIX)
+		except TypeError :
+			if _posixshmem is None :
+				return shared_memory.SharedMemory(name = name, create = create, size = size)
+
+			return UntrackedSharedMemory(name = name, create = create, size = size)
+
+	@staticmethod
+	def open_shared_memory_if_ready(name) :
+
+		# Returns None if the segment doesn't exist or hasn't been sized by its creator yet
+		# (Creating a segment and setting its size are two separate steps)
+		try :
+			shm = SharedGlyphCache.open_shared_memory(name = name)
+
+		# ValueError = "cannot mmap an empty file"
+		except (FileNotFoundError, ValueError) :
+			return None
+
+		if not shm.size :
+			shm.close()
+			return None
+
+		return shm
+
+	@staticmethod
+	def unlink_shared_memory(name) :
+
+		# Unlinked by name, so that segments that were never sized can be unlinked too
+		# (Windows removes a segment once no process has it open)
+		if _posixshmem is None :
+			return
+
+		try :
+			_posixshmem.shm_unlink("/" + name)
+
+		except FileNotFoundError :
+			pass
+
+	def warm_up(self) :
+
+		font = ImageFont.truetype(self.font_path, self.font_size)
+
+		# Characters missing from the font are skipped (they would be measured as tofu)
+		# And are left to be calculated with a fallback font, if any
+
+		# Fonts whose character map can't be read (i.e. WOFF) are assumed to draw every character
+		try :
+			coverage = get_glyph_coverage_index(self.font_path)
+
+		except UnsupportedFontFormatError :
+			coverage = None
+
+		for i in self.alphabets :
+			if (coverage is None) or coverage.covers(i) :
+				self.unique_alphabets_wh_and_bbox[i] = calculate_wh_and_bbox_of_rendered_text(text = i, font = font)
+
+		for v in self.vowels :
+			if (coverage is None) or coverage.covers(v) :
+				self.unique_vowels_img[v] = create_img_of_vowel(vowel = v, font = font)
+
+	def publish(self) :
+
+		# Serializes the cache
+		index = {
+			"font_sha256"   : self.font_sha256,
+			"font_size"     : self.font_size,
+			"glyphs_sha256" : self.glyphs_sha256,
+			"n_alphabets"   : len(self.unique_alphabets_wh_and_bbox),
+			"vowels"        : {},
+		}
+
+		# Dimensions of alphabets are stored as fixed-size records sorted by character
+		# So that they can be looked up directly in shared memory (see SharedGlyphMetrics)
+		all_records = []
+
+		for i in sorted(self.unique_alphabets_wh_and_bbox) :
+			wh, bbox = self.unique_alphabets_wh_and_bbox[i]
+			all_records.append(SharedGlyphMetrics.RECORD.pack(ord(i), *wh, *bbox))
+
+		all_pixels = []
+		offset     = 0
+
+		for v, vowel_img in self.unique_vowels_img.items() :
+			pixels = vowel_img.tobytes()
+			index["vowels"][v] = (offset, vowel_img.size[0], vowel_img.size[1])
+
+			all_pixels.append(pixels)
+			offset += len(pixels)
+
+		index_bytes = json.dumps(index, ensure_ascii = False).encode(ArabicWord.ENCODING)
+		payload     = struct.pack("<Q", len(index_bytes)) + index_bytes + b"".join(all_records) + b"".join(all_pixels)
+
+		try :
+			shm = SharedGlyphCache.open_shared_memory(name = self.name, create = True, size = SharedGlyphCache.HEADER.size + len(payload))
+
+		# Another owner took over (i.e. this process was thought to be dead)
+		except FileExistsError :
+			return False
+
+		# Writes the payload and the header before marking the segment as ready
+		# Processes attaching in between see STATE_WRITING and wait
+		shm.buf[SharedGlyphCache.HEADER.size : SharedGlyphCache.HEADER.size + len(payload)] = payload
+		shm.buf[: SharedGlyphCache.HEADER.size] = SharedGlyphCache.HEADER.pack(SharedGlyphCache.MAGIC, SHARED_GLYPH_CACHE_VERSION, SharedGlyphCache.STATE_WRITING, len(payload), zlib.crc32(payload))
+
+		# State is written last
+		struct.pack_into("<I", shm.buf, 8, SharedGlyphCache.STATE_READY)
+		shm.close()
+
+		# The owner also reads from shared memory from now on
+		# So that its own copy of the cache can be freed
+		all_alphabets_wh_and_bbox, all_vowels_img = self.unique_alphabets_wh_and_bbox, self.unique_vowels_img
+		self.unique_alphabets_wh_and_bbox = {}
+		self.unique_vowels_img            = {}
+
+		if not self.attach() :
+			self.unique_alphabets_wh_and_bbox = all_alphabets_wh_and_bbox
+			self.unique_vowels_img            = all_vowels_img
+
+		return True
+
+	def attach(self) :
+
+		# Returns True if a complete cache was found (and loaded)
+
+		shm = SharedGlyphCache.open_shared_memory_if_ready(self.name)
+
+		if shm is None :
+			return False
+
+		# Owner hasn't finished writing (or the segment isn't a cache of this version)
+		if shm.size < SharedGlyphCache.HEADER.size :
+			shm.close()
+			return False
+
+		magic, version, state, payload_len, payload_crc32 = SharedGlyphCache.HEADER.unpack_from(shm.buf, 0)
+
+		if (magic != SharedGlyphCache.MAGIC) or (version != SHARED_GLYPH_CACHE_VERSION) or (state != SharedGlyphCache.STATE_READY) :
+			shm.close()
+			return False
+
+		payload = shm.buf[SharedGlyphCache.HEADER.size : SharedGlyphCache.HEADER.size + payload_len]
+
+		if zlib.crc32(payload) != payload_crc32 :
+			payload.release()
+			shm.close()
+			return False
+
+		index_len = struct.unpack_from("<Q", payload, 0)[0]
+		index     = json.loads(bytes(payload[8 : 8 + index_len]).decode(ArabicWord.ENCODING))
+
+		# Cache of other glyphs
+		if index.get("glyphs_sha256") != self.glyphs_sha256 :
+			payload.release()
+			shm.close()
+			return False
+
+		# Dimensions and images of vowels are read from shared memory directly (no copy)
+		# i.e. Every process reads the same bytes
+		records_start = 8 + index_len
+		pixels_start  = records_start + (index["n_alphabets"] * SharedGlyphMetrics.RECORD.size)
+
+		self.unique_alphabets_wh_and_bbox = SharedGlyphMetrics(payload[records_start : pixels_start])
+
+		for v, (offset, vowel_w, vowel_h) in index["vowels"].items() :
+			if vowel_w and vowel_h :
+				pixels = payload[pixels_start + offset : pixels_start + offset + (vowel_w * vowel_h * 4)]
+				self.unique_vowels_img[v] = Image.frombuffer("RGBA", (vowel_w, vowel_h), pixels, "raw", "RGBA", 0, 1)
+
+			else :
+				self.unique_vowels_img[v] = Image.new("RGBA", (vowel_w, vowel_h), RGBA_TRANSPARENT)
+
+		self.__shm = shm
+
+		return True
+
+	def wait_and_attach(self, timeout) :
+
+		t = time.perf_counter()
+
+		while (time.perf_counter() - t) < timeout :
+			if self.attach() :
+				return True
+
+			# Owner died before publishing
+			# Its lock is removed so that another process can become the owner
+			owner_pid = self.find_owner_pid()
+
+			if not SharedGlyphCache.is_process_alive(owner_pid) :
+				self.remove_stale_lock(owner_pid)
+				return False
+
+			time.sleep(0.01)
+
+		return False
+
+	def find_owner_pid(self) :
+
+		# Returns None if there is no lock
+		# Returns 0 if the owner hasn't written its pid yet (i.e. the lock was just created)
+
+		try :
+			lock_shm = SharedGlyphCache.open_shared_memory(name = self.lock_name)
+
+		except FileNotFoundError :
+			return None
+
+		# Lock exists but hasn't been sized yet
+		except ValueError :
+			return 0
+
+		owner_pid = struct.unpack_from("<Q", lock_shm.buf, 0)[0] if lock_shm.size >= 8 else 0
+		lock_shm.close()
+
+		return owner_pid
+
+	@staticmethod
+	def is_process_alive(pid) :
+
+		if pid is None :
+			return False
+
+		# Owner is still creating the lock
+		if not pid :
+			return True
+
+		try :
+			os.kill(pid, 0)
+
+		except ProcessLookupError :
+			return False
+
+		# i.e. PermissionError, the process exists but belongs to another user
+		except OSError :
+			return True
+
+		return True
+
+	def remove_stale_lock(self, owner_pid) :
+
+		# Only removes the lock if it still belongs to the dead owner
+		# (Another process may have removed it and become the owner in the meantime)
+		if (owner_pid is None) or (self.find_owner_pid() != owner_pid) :
+			return
+
+		# A segment that the dead owner started but never marked as ready
+		shm = SharedGlyphCache.open_shared_memory_if_ready(self.name)
+
+		if shm is not None :
+			state = SharedGlyphCache.HEADER.unpack_from(shm.buf, 0)[2] if shm.size >= SharedGlyphCache.HEADER.size else SharedGlyphCache.STATE_WRITING
+			shm.close()
+
+			if state != SharedGlyphCache.STATE_READY :
+				SharedGlyphCache.unlink_shared_memory(self.name)
+
+		SharedGlyphCache.unlink_shared_memory(self.lock_name)
+
+	def calculate_n_bytes_of_private_imgs(self) :
+
+		# Bytes of pixels of images of vowels that are private to this process (not in shared memory)
+		if self.role in ["owner", "attached"] :
+			return 0
+
+		return sum(i.size[0] * i.size[1] * len(i.getbands()) for i in self.unique_vowels_img.values())
+
+	def calculate_n_bytes_of_shared_memory(self) :
+
+		if self.__shm is None :
+			return 0
+
+		return self.__shm.size
+
+	def close(self) :
+
+		# Dimensions and images of vowels point to the shared memory, they must be released first
+		if isinstance(self.unique_alphabets_wh_and_bbox, SharedGlyphMetrics) :
+			self.unique_alphabets_wh_and_bbox.release()
+
+		self.unique_alphabets_wh_and_bbox = {}
+		self.unique_vowels_img            = {}
+
+		if self.__shm is not None :
+			try :
+				self.__shm.close()
+
+			# Images of vowels are still used somewhere else (i.e. ArabicWord.unique_vowels_img)
+			# The memory is then only unmapped once they are garbage collected
+			except BufferError :
+				pass
+
+			self.__shm = None
+
+		if self.__lock_shm is not None :
+			self.__lock_shm.close()
+			self.__lock_shm = None
+
+	def unlink(self) :
+
+		# Removes the cache from shared memory (usually called by the owner once all workers are done)
+		# Processes that are still attached keep reading it until they close it
+		self.close()
+
+		for name in [self.name, self.lock_name] :
+			SharedGlyphCache.unlink_shared_memory(name)
+
+def create_arabic_word_obj(word_string, font_path, font_size, cached_unique_alphabets_wh_and_bbox, cached_unique_vowels_img, create_debug_img = False, create_img = True, fallback_font_path = None, debug = False) :
+
+	# Inits ArabicWord object
+	obj = ArabicWord(
+		word_string                = word_string,
+		font_path                  = font_path,
+		font_size                  = font_size,
+		img_background_rgba        = RGBA_TRANSPARENT,
+		cached_unique_alphabets_wh_and_bbox = cached_unique_alphabets_wh_and_bbox,
+		cached_unique_vowels_img   = cached_unique_vowels_img,
+		create_img                 = create_img,
+		fallback_font_path         = fallback_font_path,
+		debug                      = debug
+		)
+
+	# Builds cache for alphabets' dimensions
+	# (Nothing to do when ArabicWord already added them to the same cache)
+	for j in ([] if obj.unique_alphabets_wh_and_bbox is cached_unique_alphabets_wh_and_bbox else obj.unique_alphabets_wh_and_bbox) :
+
+		# Dimensions for a new alphabet was calculated
+		if j not in cached_unique_alphabets_wh_and_bbox :
+			cached_unique_alphabets_wh_and_bbox[j] = obj.unique_alphabets_wh_and_bbox[j]
+
+	# Builds cache for images of vowels
+	for j in ([] if obj.unique_vowels_img is cached_unique_vowels_img else obj.unique_vowels_img) :
+
+		# Image for a new vowel was created
+		if j not in obj.unique_vowels_img :
+			cached_unique_vowels_img[j] = obj.unique_vowels_img[j]
+
+	# Creates images of words with bounding boxed
+	if create_debug_img and create_img :
+		obj.show_bounding_boxes_in_img()
+
+	return obj
+
+def assign_arabic_word_obj_to_lines(arabic_word_obj, n_lines = 1) :
+
+	# Assigns which word is in what line
+	if n_lines != 1 :
+		arabic_word_obj_per_line = []
+		n_words_per_line         = len(arabic_word_obj) // n_lines
+
+		for i in range(n_lines) :
+			arabic_word_obj_per_line.append(arabic_word_obj[i * n_words_per_line : (i + 1) * n_words_per_line])
+
+		# Appending "leftovers"
+		# Because some words are skipped due to integer division (rounding)
+		arabic_word_obj_leftover = arabic_word_obj[n_lines * n_words_per_line : -1] + [arabic_word_obj[-1]]
+
+		if (len(arabic_word_obj) % n_lines) :
+			arabic_word_obj_per_line[-1] = arabic_word_obj_per_line[-1] + arabic_word_obj_leftover
+
+	else :
+		arabic_word_obj_per_line = [arabic_word_obj]
+
+	return arabic_word_obj_per_line
+
+def calculate_wh_of_line(obj_in_this_line, space_w) :
+
+	# Width and height of the image that create_img_of_line() creates
+	# Only uses the layout of the words (works when ArabicWord was created with create_img = False)
+
+	line_w = sum([j.word_img_wh[0] for j in obj_in_this_line]) + (len(obj_in_this_line) * space_w)
+	line_h = max([j.word_img_wh[1] for j in obj_in_this_line])
+
+	return (line_w, line_h)
+
+def calculate_wh_of_lines_together(all_line_wh, line_spacing = 0) :
+
+	# Width and height of the image that create_img_of_lines_together() creates
+	sentence_w = max([i[0] for i in all_line_wh])
+	sentence_h = sum([i[1] for i in all_line_wh]) + (len(all_line_wh) * line_spacing)
+
+	return (sentence_w, sentence_h)
+
+def create_img_of_line(obj_in_this_line, space_w, create_debug_img = False) :
+
+	# Reverses each line to convert text from LTR to RTL
+	obj_in_this_line = obj_in_this_line[::-1]
+
+	# Extracts all the widths and heights seperately for calculations later on
+	all_obj_w = [j.word_img_wh[0] for j in obj_in_this_line]
+	all_obj_h = [j.word_img_wh[1] for j in obj_in_this_line]
+
+	# The image of the word is slightly bigger than the actual space (width and height) occupied by the word in the image
+	# Since the baseline for every word is determined by the tallest word
+	# Words with alphabets that are drawn below the baseline (i.e 'ﻦ', 'ﻲ') will be favoured over others (i.e 'ﻈ')
+
+	# Baseline is thus increased by a tiny percentage
+	# So that words that have tall alphabets (going up) don't have their vowels cut (most likely when they have 2)
+
+	# Finds the tallest alphabet in the tallest word (max height) that goes below the baseline
+	# i.e Bottom of alphabet > Bottom of baseline
+	lowest_baseline = max([j.baseline[3] for j in obj_in_this_line])
+
+	# Creates image for this line
+	line_w   = sum(all_obj_w) + (len(obj_in_this_line) * space_w)
+	line_h   = max(all_obj_h)
+	line_img = Image.new("RGBA", (line_w, line_h), RGBA_TRANSPARENT)
+
+	# Pastes images of words in this line together
+	for j, obj in enumerate(obj_in_this_line) :
+		obj_x = sum(all_obj_w[:j]) + (len(all_obj_w[:j]) * space_w)
+
+		# Shifts image on y-axis to match/align baseline
+		obj_y = lowest_baseline - obj.baseline[3]
+
+		# Uses image of word with bounding boxes drawn
+		if create_debug_img :
+			img_to_paste = obj.debug_img
+
+		else :
+			img_to_paste = obj.word_img
+
+		# Pastes image of word onto the image of the line
+		line_img.paste(img_to_paste, (obj_x, obj_y), mask = img_to_paste)
+
+	return line_img
+
+def create_img_of_lines_together(all_line_img, align = "R", line_spacing = 0) :
+
+	# Width of all the text is equal to (=) the width of the longest image amongst the images of the lines
+	sentence_w = max([i.size[0] for i in all_line_img])
+	
+	all_line_h = [i.size[1] for i in all_line_img]
+	sentence_h = sum(all_line_h) + (len(all_line_img) * line_spacing)
+
+	# Creates image of the whole text/sentence by pasting images of lines together
+	sentence_img = Image.new("RGBA", (sentence_w, sentence_h), RGBA_BACKGROUND)
+
+	# Pastes images of lines together to form the sentence
+	for i, line_img in enumerate(all_line_img) :
+
+		# Centers text
+		if align.upper() == "C" :
+			line_x = (sentence_w - line_img.size[0]) // 2
+
+		# Aligns text to the left
+		elif align.upper() == "L" :
+			line_x = 0
+
+		# Aligns text to the right
+		else :
+			line_x = sentence_w - line_img.size[0]
+
+		line_y = sum(all_line_h[:i]) + (i * line_spacing)
+
+		sentence_img.paste(line_img, (line_x, line_y), mask = line_img)
+
+	return sentence_img
+
+def check_glyph_cache_matches_font(glyph_cache, font_path, font_size) :
+
+	# Glyphs of another font or font size would be used as is (and the wrong lines stored in line_img_cache)
+	if glyph_cache.font_size != font_size :
+		raise ValueError(f"Glyph cache was created for font size {glyph_cache.font_size}, not {font_size}")
+
+	if glyph_cache.font_sha256 != get_sha256_of_font(font_path) :
+		raise ValueError(f"Glyph cache was created for font {glyph_cache.font_path}, not {font_path}")
+
+def create_all_line_img(sentence_words_per_line, font_path, font_size, seperator = " ", create_debug_img = False, line_img_cache = DEFAULT_LINE_IMG_CACHE, glyph_cache = None, fallback_font_path = None, debug = False) :
+
+	# Creates images of each line (words already assigned to lines, see assign_arabic_word_obj_to_lines())
+	# i.e. Creating image of a sentence/phrase by pasting images of words together
+
+	# Uses a cache system to speed up the process
+	# Glyphs missing from glyph_cache are added on top of it (glyph_cache itself isn't changed)
+	if glyph_cache is not None :
+		check_glyph_cache_matches_font(glyph_cache, font_path = font_path, font_size = font_size)
+
+		cached_unique_alphabets_wh_and_bbox = ChainMap({}, glyph_cache.unique_alphabets_wh_and_bbox)
+		cached_unique_vowels_img   = ChainMap({}, glyph_cache.unique_vowels_img)
+
+	else :
+		cached_unique_alphabets_wh_and_bbox = {}
+		cached_unique_vowels_img   = {}
+
+	# Finds the width taken by a " "
+	space_w = None
+
+	all_line_img = []
+
+	for words_in_this_line in sentence_words_per_line :
+		line_key = (tuple(words_in_this_line), font_path, font_size, seperator, create_debug_img, fallback_font_path)
+		line_img = line_img_cache.get(line_key) if line_img_cache is not None else None
+
+		if line_img is None :
+			obj_in_this_line = []
+
+			for i in words_in_this_line :
+				obj_in_this_line.append(create_arabic_word_obj(
+					word_string                         = i,
+					font_path                           = font_path,
+					font_size                           = font_size,
+					cached_unique_alphabets_wh_and_bbox = cached_unique_alphabets_wh_and_bbox,
+					cached_unique_vowels_img            = cached_unique_vowels_img,
+					create_debug_img                    = create_debug_img,
+					fallback_font_path                  = fallback_font_path,
+					debug                               = debug
+					))
+
+			if space_w is None :
+				space_w = calculate_wh_and_bbox_of_rendered_text(text = seperator, font = ImageFont.truetype(font_path, font_size))[0][0]
+
+			line_img = create_img_of_line(obj_in_this_line, space_w = space_w, create_debug_img = create_debug_img)
+
+			if line_img_cache is not None :
+				line_img_cache.put(line_key, line_img)
+
+		all_line_img.append(line_img)
+
+	return all_line_img
+
+def create_img_of_sentence(sentence_string, font_path, font_size = 12, seperator = " ", n_lines = 1, align = "R", line_spacing = 0, create_debug_img = False, line_img_cache = DEFAULT_LINE_IMG_CACHE, glyph_cache = None, fallback_font_path = None, check_glyph_coverage = False, debug = False) :
+
+	# Note that sentence_string should have already been correctly shaped
+	# Pass line_img_cache = None to compose every line again
+	# Pass glyph_cache (i.e. SharedGlyphCache) to start from glyphs that were already calculated
+
+	# Characters that the font can't draw are drawn with fallback_font_path (if any)
+	# When check_glyph_coverage is True, characters that neither font can draw raise a ValueError before anything is drawn
+
+	if check_glyph_coverage :
+		uncovered_characters = find_uncovered_characters(sentence_string, font_path = font_path, fallback_font_path = fallback_font_path)
+
+		if uncovered_characters :
+			raise ValueError(f"Font can't draw characters {uncovered_characters}")
+
+	# Splits string into words
+	# Reverses the list because the actual start of the string is at the end
+	sentence_words = sentence_string.split(seperator)[::-1]
+	
+	# Note that here, the text is still LTR
+
+	# Assigns which word is in what line
+	# Done before creating images of words so that words in cached lines aren't rendered at all
+	sentence_words_per_line = assign_arabic_word_obj_to_lines(sentence_words, n_lines = n_lines)
+
+	# Creates images of each line
+	all_line_img = create_all_line_img(
+		sentence_words_per_line = sentence_words_per_line,
+		font_path               = font_path,
+		font_size               = font_size,
+		seperator               = seperator,
+		create_debug_img        = create_debug_img,
+		line_img_cache          = line_img_cache,
+		glyph_cache             = glyph_cache,
+		fallback_font_path      = fallback_font_path,
+		debug                   = debug
+		)
+
+	return create_img_of_lines_together(all_line_img, align = align, line_spacing = line_spacing)
+
+def create_img_of_sentence_lines_in_size(sentence_words_per_line, font_path, font_size, seperator = " ", align = "R", line_spacing = 0, create_debug_img = False, line_img_cache = None, glyph_cache = None, fallback_font_path = None, debug = False) :
+
+	# Work of create_imgs_of_sentence_in_sizes() for one font size
+	# Module-level so that it can also run in another process
+
+	all_line_img = create_all_line_img(
+		sentence_words_per_line = sentence_words_per_line,
+		font_path               = font_path,
+		font_size               = font_size,
+		seperator               = seperator,
+		create_debug_img        = create_debug_img,
+		line_img_cache          = line_img_cache,
+		glyph_cache             = glyph_cache,
+		fallback_font_path      = fallback_font_path,
+		debug                   = debug
+		)
+
+	return create_img_of_lines_together(all_line_img, align = align, line_spacing = line_spacing)
+
+def create_imgs_of_sentence_in_sizes(sentence_string, font_path, font_sizes, seperator = " ", n_lines = 1, align = "R", line_spacing = 0, create_debug_img = False, line_img_cache = DEFAULT_LINE_IMG_CACHE, glyph_caches = None, fallback_font_path = None, check_glyph_coverage = False, max_workers = None, executor = None, debug = False) :
+
+	# Creates images of the same sentence in several font sizes (i.e. thumbnail, standard, print) in one call
+	# Returns {font size : image}, each image is identical to create_img_of_sentence() with that font size
+
+	# Work that doesn't depend on the font size is done once
+	# i.e. Checking glyph coverage, splitting words and assigning words to lines
+	# Work that does (measuring and drawing words, composing lines) runs concurrently, one thread per font size
+
+	# glyph_caches = {font size : SharedGlyphCache} (optional)
+
+	# Any concurrent.futures executor can be used instead of threads (i.e. ProcessPoolExecutor)
+	# Caches can't be sent to other processes, so with an executor:
+	# - The default line_img_cache isn't used (lines are composed again)
+	# - Passing glyph_caches or another line_img_cache raises a ValueError
+
+	if (executor is not None) and (glyph_caches or ((line_img_cache is not None) and (line_img_cache is not DEFAULT_LINE_IMG_CACHE))) :
+		raise ValueError("line_img_cache and glyph_caches can't be used with an executor (pass line_img_cache = None and glyph_caches = None)")
+
+	# Same size asked for more than once is only created once
+	font_sizes = list(dict.fromkeys(font_sizes))
+
+	if not font_sizes :
+		return {}
+
+	# Checked before any thread starts
+	for font_size, glyph_cache in (glyph_caches or {}).items() :
+		check_glyph_cache_matches_font(glyph_cache, font_path = font_path, font_size = font_size)
+
+	# Character maps are read once, before any thread needs them
+	if (fallback_font_path is not None) or check_glyph_coverage :
+		uncovered_characters = find_uncovered_characters(sentence_string, font_path = font_path, fallback_font_path = fallback_font_path)
+
+		if check_glyph_coverage and uncovered_characters :
+			raise ValueError(f"Font can't draw characters {uncovered_characters}")
+
+	# Splits string into words
+	# Reverses the list because the actual start of the string is at the end
+	sentence_words = sentence_string.split(seperator)[::-1]
+
+	# Assigns which word is in what line (the same for every font size)
+	sentence_words_per_line = assign_arabic_word_obj_to_lines(sentence_words, n_lines = n_lines)
+
+	# Each size has its own cache of glyphs, nothing is shared between threads except line_img_cache (thread-safe)
+	all_args = [
+		(sentence_words_per_line, font_path, font_size, seperator, align, line_spacing, create_debug_img, line_img_cache, (glyph_caches or {}).get(font_size), fallback_font_path, debug)
+		for font_size in font_sizes
+	]
+
+	# Default line_img_cache is dropped (see above)
+	if executor is not None :
+		all_args = [args[: 7] + (None, None) + args[9 :] for args in all_args]
+		all_img  = list(executor.map(create_img_of_sentence_lines_in_size, *zip(*all_args)))
+
+	else :
+		with ThreadPoolExecutor(max_workers = max_workers or len(font_sizes)) as thread_executor :
+			all_img = list(thread_executor.map(create_img_of_sentence_lines_in_size, *zip(*all_args)))
+
+	return dict(zip(font_sizes, all_img))
+
+def fit_img_of_sentence_in_box(sentence_string, font_path, box_wh, min_font_size = 1, max_font_size = None, seperator = " ", n_lines = None, max_n_lines = None, align = "R", line_spacing = 0, create_debug_img = False, line_img_cache = DEFAULT_LINE_IMG_CACHE, fallback_font_path = None, check_glyph_coverage = False, debug = False) :
+
+	# Finds the largest font size (and number of lines) at which the image of the sentence fits in box_wh
+	# Then creates the image of the sentence only once, with create_img_of_sentence()
+
+	# Font sizes and numbers of lines are binary searched using only the layout of the words
+	# i.e. Words are measured (ArabicWord with create_img = False) but never drawn
+	# Only the images of vowels are drawn, once per font size, because they are cropped to their pixels
+
+	# When n_lines is given, only the font size is searched
+	# Otherwise, the number of lines is searched between 1 and max_n_lines (defaults to the number of words)
+
+	# fallback_font_path and check_glyph_coverage work like in create_img_of_sentence()
+	# Coverage is checked once, before any font size is measured
+
+	if check_glyph_coverage :
+		uncovered_characters = find_uncovered_characters(sentence_string, font_path = font_path, fallback_font_path = fallback_font_path)
+
+		if uncovered_characters :
+			raise ValueError(f"Font can't draw characters {uncovered_characters}")
+
+	box_w, box_h = box_wh
+
+	# Note that sentence_string should have already been correctly shaped
+	sentence_words = sentence_string.split(seperator)[::-1]
+
+	# Glyphs are always smaller than the font size, so anything bigger than the box can't fit
+	if max_font_size is None :
+		max_font_size = max(box_h, min_font_size)
+
+	# Each line needs at least one word
+	if (n_lines is not None) and not (1 <= n_lines <= len(sentence_words)) :
+		raise ValueError(f"n_lines = {n_lines} but the sentence has {len(sentence_words)} words (each line needs at least one word)")
+
+	if n_lines is None :
+		all_n_lines = list(range(1, min(max_n_lines or len(sentence_words), len(sentence_words)) + 1))
+
+	else :
+		all_n_lines = [n_lines]
+
+	n_measurement_iterations = 0
+	n_font_sizes_measured    = 0
+
+	def find_n_lines_that_fits(font_size) :
+
+		nonlocal n_measurement_iterations, n_font_sizes_measured
+
+		# Words are measured once per font size
+		# Their layout is then shared by every number of lines tried
+		cached_unique_alphabets_wh_and_bbox = {}
+		cached_unique_vowels_img            = {}
+
+		arabic_word_obj = []
+
+		try :
+			for i in sentence_words :
+				arabic_word_obj.append(create_arabic_word_obj(
+					word_string                         = i,
+					font_path                           = font_path,
+					font_size                           = font_size,
+					cached_unique_alphabets_wh_and_bbox = cached_unique_alphabets_wh_and_bbox,
+					cached_unique_vowels_img            = cached_unique_vowels_img,
+					create_img                          = False,
+					fallback_font_path                  = fallback_font_path,
+					debug                               = debug
+					))
+
+		# At very small font sizes, images of vowels have no pixels left to crop to
+		# create_img_of_sentence() can't create an image at this size either
+		except VowelTooSmallToCropError :
+			return False
+
+		space_w = calculate_wh_and_bbox_of_rendered_text(text = seperator, font = ImageFont.truetype(font_path, font_size))[0][0]
+
+		n_font_sizes_measured += 1
+
+		def calculate_wh(this_n_lines) :
+
+			nonlocal n_measurement_iterations
+			n_measurement_iterations += 1
+
+			all_line_wh = [calculate_wh_of_line(j, space_w = space_w) for j in assign_arabic_word_obj_to_lines(arabic_word_obj, n_lines = this_n_lines)]
+
+			return calculate_wh_of_lines_together(all_line_wh, line_spacing = line_spacing)
+
+		# More lines = taller image
+		# Finds the most lines that fit in the height of the box
+		lo, hi      = 0, len(all_n_lines) - 1
+		n_lines_max = None
+
+		while lo <= hi :
+			mid = (lo + hi) // 2
+
+			if calculate_wh(all_n_lines[mid])[1] <= box_h :
+				n_lines_max = mid
+				lo          = mid + 1
+
+			else :
+				hi = mid - 1
+
+		# Too tall even with the fewest lines
+		if n_lines_max is None :
+			return None
+
+		# The width doesn't always get smaller with more lines
+		# Because leftover words are all added to the last line (see assign_arabic_word_obj_to_lines())
+		# Finds the fewest lines (i.e. biggest text) that fit in the width of the box
+		for i in all_n_lines[: n_lines_max + 1] :
+			wh = calculate_wh(i)
+
+			if (wh[0] <= box_w) and (wh[1] <= box_h) :
+				return (i, wh)
+
+		return None
+
+	# Binary searches the largest font size that fits
+	lo, hi = min_font_size, max_font_size
+	best   = None
+
+	while lo <= hi :
+		mid = (lo + hi) // 2
+		fit = find_n_lines_that_fits(mid)
+
+		if debug :
+			print(f"----------\nFitting In Box\n\nBox                  = {box_wh}\nFont size            = {mid}\nLines, Width, Height = {fit}\n")
+
+		# Font size is too small to be rendered
+		# Not a reason to try smaller font sizes
+		if fit is False :
+			lo = mid + 1
+
+		elif fit is not None :
+			best = (mid, fit[0], fit[1])
+			lo   = mid + 1
+
+		else :
+			hi = mid - 1
+
+	if best is None :
+		raise ValueError(f"Sentence doesn't fit in box {box_wh} with any font size between {min_font_size} and {max_font_size} that can be rendered")
+
+	font_size, n_lines, wh = best
+
+	# Only rendering
+	sentence_img = create_img_of_sentence(
+		sentence_string    = sentence_string,
+		font_path          = font_path,
+		font_size          = font_size,
+		seperator          = seperator,
+		n_lines            = n_lines,
+		align              = align,
+		line_spacing       = line_spacing,
+		create_debug_img   = create_debug_img,
+		line_img_cache     = line_img_cache,
+		fallback_font_path = fallback_font_path,
+		debug              = debug
+		)
+
+	return {
+		"img"                      : sentence_img,
+		"font_size"                : font_size,
+		"n_lines"                  : n_lines,
+		"wh"                       : wh,
+		"n_measurement_iterations" : n_measurement_iterations,
+		"n_font_sizes_measured"    : n_font_sizes_measured,
+	}
+
+class ArabicSentenceRenderSession :
+
+	# Re-renders a sentence that is edited a little at a time (i.e. an editor preview on every keystroke)
+	# Keeps the images of the words and lines of the previous frame
+	# Only words that changed and lines that contain them are rendered again
+
+	# Images created are identical to the images created by create_img_of_sentence() with the same parameters
+
+	def __init__(self, font_path, font_size = 12, seperator = " ", n_lines = 1, align = "R", line_spacing = 0, create_debug_img = False, fallback_font_path = None, check_glyph_coverage = False, debug = False) :
+
+		self.font_path            = font_path
+		self.font_size            = font_size
+		self.seperator            = seperator
+		self.n_lines              = n_lines
+		self.align                = align
+		self.line_spacing         = line_spacing
+		self.create_debug_img     = create_debug_img
+		self.fallback_font_path   = fallback_font_path
+		self.check_glyph_coverage = check_glyph_coverage
+		self.__debug              = debug
+
+		# Same font and size for every frame, so the cache stays valid for the whole session
+		self.cached_unique_alphabets_wh_and_bbox = {}
+		self.cached_unique_vowels_img            = {}
+
+		# Finds the width taken by a " "
+		self.space_w = calculate_wh_and_bbox_of_rendered_text(text = seperator, font = ImageFont.truetype(font_path, font_size))[0][0]
+
+		# Previous frame
+		# ... = {word string : ArabicWord object}
+		self.prev_arabic_word_obj = {}
+
+		# ... = {(word string, ...) : image of line}
+		# The width and baseline of a line only depend on the words in it (and their order)
+		self.prev_line_img = {}
+
+		self.sentence_img = None
+		self.frame_stats  = None
+
+		# Totals for every frame rendered in this session
+		self.n_frames               = 0
+		self.n_words_total          = 0
+		self.n_words_rendered_total = 0
+		self.n_lines_total          = 0
+		self.n_lines_rendered_total = 0
+
+	def render(self, sentence_string) :
+
+		# Note that sentence_string should have already been correctly shaped
+
+		# Checked on every frame, before anything is rendered (the previous frame is kept if it raises)
+		if self.check_glyph_coverage :
+			uncovered_characters = find_uncovered_characters(sentence_string, font_path = self.font_path, fallback_font_path = self.fallback_font_path)
+
+			if uncovered_characters :
+				raise ValueError(f"Font can't draw characters {uncovered_characters}")
+
+		# Splits string into words
+		# Reverses the list because the actual start of the string is at the end
+		sentence_words = sentence_string.split(self.seperator)[::-1]
+
+		# Diffs the words against the words of the previous frame
+		# Words that were not in the previous frame (new or edited) are rendered
+		# Words that were (even if they moved) reuse their ArabicWord object
+
+		arabic_word_obj  = []
+		this_word_obj    = {}
+		n_words_rendered = 0
+
+		for i in sentence_words :
+
+			# Word appears more than once in this frame
+			if i in this_word_obj :
+				obj = this_word_obj[i]
+
+			# Unchanged word
+			elif i in self.prev_arabic_word_obj :
+				obj = self.prev_arabic_word_obj[i]
+
+			# Changed word
+			else :
+				obj = create_arabic_word_obj(
+					word_string                         = i,
+					font_path                           = self.font_path,
+					font_size                           = self.font_size,
+					cached_unique_alphabets_wh_and_bbox = self.cached_unique_alphabets_wh_and_bbox,
+					cached_unique_vowels_img            = self.cached_unique_vowels_img,
+					create_debug_img                    = self.create_debug_img,
+					fallback_font_path                  = self.fallback_font_path,
+					debug                               = self.__debug
+					)
+
+				n_words_rendered += 1
+
+			this_word_obj[i] = obj
+			arabic_word_obj.append(obj)
+
+		# Assigns which word is in what line
+		arabic_word_obj_per_line = assign_arabic_word_obj_to_lines(arabic_word_obj, n_lines = self.n_lines)
+
+		# Creates images of lines that changed
+		all_line_img      = []
+		this_line_img     = {}
+		all_line_rendered = []
+
+		for obj_in_this_line in arabic_word_obj_per_line :
+			line_key = tuple(j.word_string for j in obj_in_this_line)
+
+			if line_key in this_line_img :
+				line_img = this_line_img[line_key]
+				all_line_rendered.append(False)
+
+			elif line_key in self.prev_line_img :
+				line_img = self.prev_line_img[line_key]
+				all_line_rendered.append(False)
+
+			else :
+				line_img = create_img_of_line(obj_in_this_line, space_w = self.space_w, create_debug_img = self.create_debug_img)
+				all_line_rendered.append(True)
+
+			this_line_img[line_key] = line_img
+			all_line_img.append(line_img)
+
+		# Lines are always pasted together again
+		# Because the width of the sentence (hence alignment of every line) may have changed
+		self.sentence_img = create_img_of_lines_together(all_line_img, align = self.align, line_spacing = self.line_spacing)
+
+		# Only keeps what is needed for the next frame
+		self.prev_arabic_word_obj = this_word_obj
+		self.prev_line_img        = this_line_img
+
+		# Records how much of this frame was rendered again
+		sentence_area          = self.sentence_img.size[0] * self.sentence_img.size[1]
+		area_of_lines_rendered = sum(i.size[0] * i.size[1] for i, rendered in zip(all_line_img, all_line_rendered) if rendered)
+		n_lines_rendered       = sum(all_line_rendered)
+
+		self.frame_stats = {
+			"n_words"             : len(arabic_word_obj),
+			"n_words_rendered"    : n_words_rendered,
+			"n_lines"             : len(all_line_img),
+			"n_lines_rendered"    : n_lines_rendered,
+			"ratio_area_rendered" : (area_of_lines_rendered / sentence_area) if sentence_area else 0.0,
+		}
+
+		self.n_frames               += 1
+		self.n_words_total          += len(arabic_word_obj)
+		self.n_words_rendered_total += n_words_rendered
+		self.n_lines_total          += len(all_line_img)
+		self.n_lines_rendered_total += n_lines_rendered
+
+		if self.__debug :
+			print(f"----------\nFrame {self.n_frames}\n\nWords rendered = {n_words_rendered} / {len(arabic_word_obj)}\nLines rendered = {n_lines_rendered} / {len(all_line_img)}\nArea rendered  = {self.frame_stats['ratio_area_rendered']:.2%}\n")
+
+		return self.sentence_img
+
+if __name__ == "__main__" :
+
+	# These are prerequisites before using the class and its methods
+
+	# Connects alphabets to each other correctly (shapes alphabets)
+	import arabic_reshaper
+
+	arabic_reshaper_config = {
+		"delete_harakat"         : False,
+		"shift_harakat_position" : False,
+		"delete_tatweel"         : True
+	}
+
+	reshaper = arabic_reshaper.ArabicReshaper(configuration = arabic_reshaper_config)
+
+	# Right to Left orientation
+	from bidi.algorithm import get_display
+
+	# PIL font parameters
+	font_path = "path to locally installed font (.ttf)"
+	font_size = 64
+
+	# Correctly shapes text
+	text_unshaped     = u"لَكِنَّ لَا بَدَّ أَنَّ أوْضَحَ لَكَ أَنَّ كُلُّ هَذِهِ الْأَفْكَارِ الْمَغْلُوطَةِ حَوْلَ اِسْتِنْكَارِ النَّشْوَةٌ وَتَمْجيدِ الْألَمِ نَشَّأَتٍ بِالْفِعْلِ، وَسَأَعْرُضُ لَكَ التَّفَاصِيلُ لِتَكْتَشِفٌ حَقِيقَةٌ وَأَسَاسٍ تِلْكَ السَّعَادَةً الْبَشَرِيَّةِ، فَلَا أحَدٌ يَرْفُضُ أَوْ يَكْرَهُ أَوْ يَتَجَنَّبُ الشُّعُورٌ بِالسَّعَادَةِ، وَلَكِنَّ بِفَضْلِ هَؤُلَاءِ الْأَشْخَاصِ الَّذِينَ لَا يُدْرِكُونَ بِأَنَّ السَّعَادَةً لَا بَدَّ أَنَّ نَسْتَشْعِرُهَا بِصُورَةِ أَكْثَرِ عَقْلَانِيَّةٍ وَمِنْطَقِيَّةٍ فَيَعْرُضُهُمْ هَذَا لِمُوَاجَهَةُ الظُّروفآ الْألِيمَةِ، وَأُكَرِّرُ بِأَنَّهُ لَا يُوجَدُ مَنْ يَرْغَبُ فِي الْحُبِّ وَنَيْلِ الْمَنَالِ وَيَتَلَذَّذُ بِالْآلَاَمِ، الْألَمَ هُوَ الْألَمُ وَلَكِنَّ نَتِيجَةً لِظُروفٍ مَا قَدْ تَكْمُنُ السعاده فِيمَا نَتَحَمَّلُهُ مِنْ كَدٍّ وَأُسِّيٍّ."
+	text_shaped       = get_display(reshaper.reshape(text_unshaped), base_dir = "R")
+	text_shaped_words = text_shaped.split(" ")
+
+	# How to use the class and its methods
+
+	# Inits object
+	arabic_word = ArabicWord(
+		word_string = text_shaped_words[45],
+		font_path   = font_path,
+		font_size   = font_size,
+		debug       = TERMINAL_LOGS
+		)
+
+	# The image of the arabic word is created when the ArabicWord object is initialised
+	# Attribute word_img is a PIL Image object
+	arabic_word.word_img.show()
+
+	# Draws bounding boxes for validation
+	arabic_word.show_bounding_boxes_in_img()
+	arabic_word.debug_img.show()
+
+	# Creating image of a sentence
+	sentence_img = create_img_of_sentence(
+		sentence_string      = text_shaped,
+		n_lines              = 10,
+		font_path            = font_path,
+		font_size            = font_size,
+		align                = "R",
+		line_spacing         = 10,
+		create_debug_img     = False,
+		debug                = TERMINAL_LOGS
+		)	
+
+	sentence_img.show()
+
+	# Largest font size at which the sentence fits in a box
+	# Font sizes are searched by measuring words only, the image is created once
+	fit = fit_img_of_sentence_in_box(
+		sentence_string = text_shaped,
+		font_path       = font_path,
+		box_wh          = (1280, 720),
+		align           = "R",
+		line_spacing    = 10,
+		debug           = TERMINAL_LOGS
+		)
+
+	fit["img"].show()
+	print(f"Font size = {fit['font_size']}, Lines = {fit['n_lines']}, Measurements = {fit['n_measurement_iterations']}")
+
+	# Glyphs shared between worker processes
+	# The first process to create it warms it up, the others attach to it
+	glyph_cache = SharedGlyphCache(font_path = font_path, font_size = font_size, debug = TERMINAL_LOGS)
+
+	sentence_img = create_img_of_sentence(
+		sentence_string = text_shaped,
+		n_lines         = 10,
+		font_path       = font_path,
+		font_size       = font_size,
+		glyph_cache     = glyph_cache,
+		debug           = TERMINAL_LOGS
+		)
+
+	# Once every worker is done
+	glyph_cache.unlink()
+
+	# Same sentence in several font sizes (i.e. thumbnail, standard, print) from one call
+	all_sentence_img = create_imgs_of_sentence_in_sizes(
+		sentence_string = text_shaped,
+		font_path       = font_path,
+		font_sizes      = [16, 64, 128],
+		n_lines         = 10,
+		line_spacing    = 10,
+		debug           = TERMINAL_LOGS
+		)
+
+	all_sentence_img[16].show()
+
+	# Characters missing from the font are found from its character map, before anything is drawn
+	print(find_uncovered_characters(text_shaped, font_path = font_path))
+
+	# And can be drawn with a fallback font instead
+	sentence_img = create_img_of_sentence(
+		sentence_string      = text_shaped,
+		n_lines              = 10,
+		font_path            = font_path,
+		font_size            = font_size,
+		fallback_font_path   = "path to another locally installed font (.ttf)",
+		check_glyph_coverage = True,
+		debug                = TERMINAL_LOGS
+		)
+
+	# Identical lines are composed only once (see LineImgCache)
+	print(DEFAULT_LINE_IMG_CACHE.stats())
+
+	# Re-rendering a sentence that is being edited
+	# Only the words that changed (and their lines) are rendered again
+	render_session = ArabicSentenceRenderSession(
+		font_path    = font_path,
+		font_size    = font_size,
+		n_lines      = 10,
+		align        = "R",
+		line_spacing = 10,
+		debug        = TERMINAL_LOGS
+		)
+
+	for text_edited in [text_shaped, " ".join(text_shaped_words[:-1])] :
+		sentence_img = render_session.render(text_edited)
 
 	sentence_img.show()
+	print(render_session.frame_stats)
@@ -0,0 +1,1087 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+
+import PIL
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+import pyarabic_word_to_image as awti
+
+# Renders a fixed corpus with a local font and compares the results pixel-exactly against stored golden images
+# Also times each stage of the renderer against a stored performance baseline
+
+# Any speed-up to cropping, measuring or compositing could silently shift pixels
+# Because ArabicWord positions vowels using subtle offsets given by textbbox
+
+# Usage:
+# python pyarabic_word_to_image_regression.py --font-path <font.ttf> --update   (stores golden images and baseline)
+# python pyarabic_word_to_image_regression.py --font-path <font.ttf>            (checks against them)
+# python pyarabic_word_to_image_regression.py --font-path <font.ttf> --strict   (also fails if a stage is slower)
+
+# Cases marked "fallback" are only rendered with --fallback-font-path <font.ttf> (also given with --update)
+
+DEFAULT_REGRESSION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regression")
+
+# A stage is only considered slower when it exceeds its baseline by this ratio
+# Slower stages are reported as warnings, they only fail the check with --strict
+DEFAULT_SLOWDOWN_THRESHOLD = 1.25
+
+# Each stage is timed several times and the fastest run is kept (least noisy)
+# The baseline is timed with more runs, since every later check is compared against it
+DEFAULT_TIMING_REPEATS   = 5
+DEFAULT_BASELINE_REPEATS = 20
+
+# Fixed corpus (unshaped)
+# Covers vowels above and below, shadda with a second vowel, 'ﻻ' ligatures, tanween and punctuation
+CORPUS = {
+	"word_fatha"       : u"لَكَ",
+	"word_shadda"      : u"لَكِنَّ",
+	"word_lam_alef"    : u"لَا",
+	"word_lam_hamza"   : u"الْألَمِ",
+	"word_tanween"     : u"نَشَّأَتٍ",
+	"word_kasra"       : u"بِالْفِعْلِ،",
+	"sentence_short"   : u"لَا بَدَّ أَنَّ أوْضَحَ لَكَ",
+	"sentence_long"    : u"لَكِنَّ لَا بَدَّ أَنَّ أوْضَحَ لَكَ أَنَّ كُلُّ هَذِهِ الْأَفْكَارِ الْمَغْلُوطَةِ حَوْلَ اِسْتِنْكَارِ النَّشْوَةٌ وَتَمْجيدِ الْألَمِ نَشَّأَتٍ بِالْفِعْلِ، وَسَأَعْرُضُ لَكَ التَّفَاصِيلُ لِتَكْتَشِفٌ حَقِيقَةٌ وَأَسَاسٍ تِلْكَ السَّعَادَةً الْبَشَرِيَّةِ،",
+}
+
+# Parameters used to render each sentence of the corpus
+SENTENCE_RENDER_PARAMS = {
+	"sentence_short" : [
+		{"n_lines" : 1, "align" : "R", "line_spacing" : 0,  "create_debug_img" : False},
+		{"n_lines" : 1, "align" : "R", "line_spacing" : 0,  "create_debug_img" : True},
+	],
+
+	"sentence_long"  : [
+		{"n_lines" : 4, "align" : "R", "line_spacing" : 10, "create_debug_img" : False},
+		{"n_lines" : 3, "align" : "C", "line_spacing" : 0,  "create_debug_img" : False},
+		{"n_lines" : 5, "align" : "L", "line_spacing" : 4,  "create_debug_img" : True},
+	],
+}
+
+# Sentences re-rendered with ArabicSentenceRenderSession, one word edited at a time
+# Every frame must be identical to create_img_of_sentence() with the same parameters
+# Frame = (word replaced, word replacing it, expected frame_stats)
+SESSION_CASES = {
+	"session_short" : {
+		"sentence" : "sentence_short",
+		"params"   : {"n_lines" : 1, "align" : "R", "line_spacing" : 0,  "create_debug_img" : True},
+		"frames"   : [
+			(None,             None,             {"n_words" : 5,  "n_words_rendered" : 5,  "n_lines" : 1, "n_lines_rendered" : 1}),
+			(u"أوْضَحَ",        u"أوْضَحُ",        {"n_words" : 5,  "n_words_rendered" : 1,  "n_lines" : 1, "n_lines_rendered" : 1}),
+		],
+	},
+
+	"session_short_fallback" : {
+		"sentence" : "sentence_short",
+		"fallback" : True,
+		"params"   : {"n_lines" : 1, "align" : "R", "line_spacing" : 0,  "create_debug_img" : False},
+		"frames"   : [
+			(None,             None,             {"n_words" : 5,  "n_words_rendered" : 5,  "n_lines" : 1, "n_lines_rendered" : 1}),
+			(u"أوْضَحَ",        u"أوْضَحُ",        {"n_words" : 5,  "n_words_rendered" : 1,  "n_lines" : 1, "n_lines_rendered" : 1}),
+		],
+	},
+
+	"session_long"  : {
+		"sentence" : "sentence_long",
+		"params"   : {"n_lines" : 4, "align" : "R", "line_spacing" : 10, "create_debug_img" : False},
+		"frames"   : [
+
+			# Words that appear twice ('أَنَّ' and 'لَكَ') are only rendered once
+			(None,             None,             {"n_words" : 27, "n_words_rendered" : 25, "n_lines" : 4, "n_lines_rendered" : 4}),
+			(u"الْأَفْكَارِ",    u"الْأَفْكَارُ",    {"n_words" : 27, "n_words_rendered" : 1,  "n_lines" : 4, "n_lines_rendered" : 1}),
+			(None,             None,             {"n_words" : 27, "n_words_rendered" : 0,  "n_lines" : 4, "n_lines_rendered" : 0}),
+		],
+	},
+}
+
+# Sentences fitted in a box with fit_img_of_sentence_in_box()
+# The size measured must be the size of the image, and the next font size must not fit
+FIT_CASES = {
+	"fit_long"           : {"sentence" : "sentence_long",  "box_wh" : (500, 300), "params" : {"max_n_lines" : 6, "align" : "C", "line_spacing" : 4}},
+	"fit_short_one_line" : {"sentence" : "sentence_short", "box_wh" : (400, 80),  "params" : {"n_lines" : 1}},
+	"fit_short_fallback" : {"sentence" : "sentence_short", "box_wh" : (300, 120), "params" : {"max_n_lines" : 3}, "fallback" : True},
+}
+
+# Character that no font of the gate draws (last private use character)
+# check_glyph_coverage = True must refuse a sentence containing it
+UNCOVERED_CHARACTER = u"\U0010FFFD"
+
+FONT_SIZES = [24, 64]
+
+# Cases rendered another way, that must be identical to the golden image of the case they are named after
+# i.e. "sentence_long_64_0_glyph_cache_owner" is compared to "sentence_long_64_0.png"
+SAME_GOLDEN_IMG_SUFFIXES = ["_glyph_cache_owner", "_glyph_cache_attached", "_multi_size"]
+
+def shape_text(text_unshaped) :
+
+	# Same prerequisites as when using the module directly
+	import arabic_reshaper
+	from bidi.algorithm import get_display
+
+	arabic_reshaper_config = {
+		"delete_harakat"         : False,
+		"shift_harakat_position" : False,
+		"delete_tatweel"         : True
+	}
+
+	reshaper = arabic_reshaper.ArabicReshaper(configuration = arabic_reshaper_config)
+
+	return get_display(reshaper.reshape(text_unshaped), base_dir = "R")
+
+def find_golden_img_name(name) :
+
+	for suffix in SAME_GOLDEN_IMG_SUFFIXES :
+		if name.endswith(suffix) :
+			return name[: - len(suffix)]
+
+	return name
+
+def create_owner_and_attached_glyph_caches(font_path, font_size) :
+
+	# Returns (cache that published the glyphs, cache that reads them from shared memory)
+	# Both in this process, the attached cache then reads the segment of the owner (zero-copy)
+
+	owner_glyph_cache = awti.SharedGlyphCache(font_path, font_size)
+
+	# Left over by a previous run that didn't unlink it
+	if owner_glyph_cache.role != "owner" :
+		owner_glyph_cache.unlink()
+		owner_glyph_cache = awti.SharedGlyphCache(font_path, font_size)
+
+	return (owner_glyph_cache, awti.SharedGlyphCache(font_path, font_size))
+
+def render_corpus(font_path, fallback_font_path = None) :
+
+	# Returns {case name : PIL Image} for every case of the corpus
+	# Case names are used as file names for golden images
+
+	rendered = {}
+
+	for font_size in FONT_SIZES :
+		for name, text_unshaped in CORPUS.items() :
+			text_shaped = shape_text(text_unshaped)
+
+			# Single words are rendered with ArabicWord
+			if name.startswith("word_") :
+
+				# A fresh cache for every word so that cases don't depend on each other
+				obj = awti.ArabicWord(
+					word_string                         = text_shaped,
+					font_path                           = font_path,
+					font_size                           = font_size,
+					cached_unique_alphabets_wh_and_bbox = {},
+					cached_unique_vowels_img            = {}
+					)
+
+				obj.show_bounding_boxes_in_img()
+
+				rendered[f"{name}_{font_size}"]       = obj.word_img
+				rendered[f"{name}_{font_size}_debug"] = obj.debug_img
+
+			# Sentences are rendered with create_img_of_sentence
+			else :
+				for i, params in enumerate(SENTENCE_RENDER_PARAMS[name]) :
+					rendered[f"{name}_{font_size}_{i}"] = awti.create_img_of_sentence(
+						sentence_string = text_shaped,
+						font_path       = font_path,
+						font_size       = font_size,
+						line_img_cache  = None,
+						**params
+						)
+
+					# Renders again with images of lines coming from the cache
+					line_img_cache = awti.LineImgCache()
+
+					for _ in range(2) :
+						rendered[f"{name}_{font_size}_{i}_cached"] = awti.create_img_of_sentence(
+							sentence_string = text_shaped,
+							font_path       = font_path,
+							font_size       = font_size,
+							line_img_cache  = line_img_cache,
+							**params
+							)
+
+					# Renders again with characters missing from the font drawn with the fallback font
+					if fallback_font_path is not None :
+						rendered[f"{name}_{font_size}_{i}_fallback"] = awti.create_img_of_sentence(
+							sentence_string    = text_shaped,
+							font_path          = font_path,
+							font_size          = font_size,
+							line_img_cache     = None,
+							fallback_font_path = fallback_font_path,
+							**params
+							)
+
+	# Sentences rendered with glyphs from SharedGlyphCache (compared to the golden images of the sentences above)
+	for font_size in FONT_SIZES :
+		all_glyph_cache = create_owner_and_attached_glyph_caches(font_path, font_size)
+
+		try :
+			for role, glyph_cache in zip(["owner", "attached"], all_glyph_cache) :
+				for name in SENTENCE_RENDER_PARAMS :
+					for i, params in enumerate(SENTENCE_RENDER_PARAMS[name]) :
+						rendered[f"{name}_{font_size}_{i}_glyph_cache_{role}"] = awti.create_img_of_sentence(
+							sentence_string = shape_text(CORPUS[name]),
+							font_path       = font_path,
+							font_size       = font_size,
+							line_img_cache  = None,
+							glyph_cache     = glyph_cache,
+							**params
+							)
+
+		finally :
+			all_glyph_cache[1].close()
+			all_glyph_cache[0].unlink()
+
+	# Sentences rendered in every font size in one call (compared to the golden images of the sentences above)
+	for name in SENTENCE_RENDER_PARAMS :
+		for i, params in enumerate(SENTENCE_RENDER_PARAMS[name]) :
+			all_img = awti.create_imgs_of_sentence_in_sizes(
+				sentence_string = shape_text(CORPUS[name]),
+				font_path       = font_path,
+				font_sizes      = FONT_SIZES,
+				line_img_cache  = None,
+				**params
+				)
+
+			for font_size, img in all_img.items() :
+				rendered[f"{name}_{font_size}_{i}_multi_size"] = img
+
+	# Frames of sessions
+	for font_size in FONT_SIZES :
+		for name, frames in render_session_cases(font_path, font_size, fallback_font_path = fallback_font_path).items() :
+			for i, (frame_img, _, _) in enumerate(frames) :
+				rendered[f"{name}_{font_size}_{i}"] = frame_img
+
+	# Sentences fitted in boxes
+	for name, fit in render_fit_cases(font_path, fallback_font_path = fallback_font_path).items() :
+		rendered[name] = fit["img"]
+
+	return rendered
+
+def find_fallback_font_path_of_case(case, fallback_font_path) :
+
+	# Returns (skipped, fallback font path used by the case)
+	# Cases marked "fallback" are skipped when no fallback font is given
+	if not case.get("fallback") :
+		return (False, None)
+
+	return (fallback_font_path is None, fallback_font_path)
+
+def render_fit_cases(font_path, fallback_font_path = None) :
+
+	# Returns {case name : result of fit_img_of_sentence_in_box()}
+
+	rendered = {}
+
+	for name, case in FIT_CASES.items() :
+		skipped, case_fallback_font_path = find_fallback_font_path_of_case(case, fallback_font_path)
+
+		if skipped :
+			continue
+
+		rendered[name] = awti.fit_img_of_sentence_in_box(
+			sentence_string    = shape_text(CORPUS[case["sentence"]]),
+			font_path          = font_path,
+			box_wh             = case["box_wh"],
+			line_img_cache     = None,
+			fallback_font_path = case_fallback_font_path,
+			**case["params"]
+			)
+
+	return rendered
+
+def check_fit_cases(font_path, fallback_font_path = None) :
+
+	# Returns {case name : result}
+	# A case fails if the size measured isn't the size of the image created
+	# Or if the sentence (actually rendered) also fits in the box at the next font size, with any number of lines tried
+
+	results = {}
+
+	for name, fit in render_fit_cases(font_path, fallback_font_path = fallback_font_path).items() :
+		case         = FIT_CASES[name]
+		box_w, box_h = case["box_wh"]
+		params       = dict(case["params"])
+
+		text_shaped = shape_text(CORPUS[case["sentence"]])
+		n_words     = len(text_shaped.split(" "))
+
+		if "n_lines" in params :
+			all_n_lines = [params.pop("n_lines")]
+
+		else :
+			all_n_lines = list(range(1, min(params.pop("max_n_lines", None) or n_words, n_words) + 1))
+
+		n_lines_that_fit_bigger = []
+
+		for n_lines in all_n_lines :
+			bigger_img = awti.create_img_of_sentence(
+				sentence_string    = text_shaped,
+				font_path          = font_path,
+				font_size          = fit["font_size"] + 1,
+				n_lines            = n_lines,
+				line_img_cache     = None,
+				fallback_font_path = find_fallback_font_path_of_case(case, fallback_font_path)[1],
+				**params
+				)
+
+			if (bigger_img.size[0] <= box_w) and (bigger_img.size[1] <= box_h) :
+				n_lines_that_fit_bigger.append(n_lines)
+
+		if tuple(fit["wh"]) != fit["img"].size :
+			status = "measured size differs from image"
+
+		elif n_lines_that_fit_bigger :
+			status = "next font size also fits"
+
+		else :
+			status = "ok"
+
+		results[name] = {
+			"status"                  : status,
+			"font_size"               : fit["font_size"],
+			"n_lines"                 : fit["n_lines"],
+			"wh"                      : fit["wh"],
+			"img_wh"                  : fit["img"].size,
+			"n_lines_that_fit_bigger" : n_lines_that_fit_bigger,
+		}
+
+	return results
+
+def render_session_cases(font_path, font_size, fallback_font_path = None) :
+
+	# Returns {case name : [(image of frame, image from create_img_of_sentence(), frame_stats), ...]}
+
+	rendered = {}
+
+	for name, case in SESSION_CASES.items() :
+		skipped, case_fallback_font_path = find_fallback_font_path_of_case(case, fallback_font_path)
+
+		if skipped :
+			continue
+
+		session = awti.ArabicSentenceRenderSession(font_path = font_path, font_size = font_size, fallback_font_path = case_fallback_font_path, **case["params"])
+
+		text_unshaped = CORPUS[case["sentence"]]
+		frames        = []
+
+		for word_replaced, word_replacing, _ in case["frames"] :
+			if word_replaced is not None :
+				text_unshaped = text_unshaped.replace(word_replaced, word_replacing)
+
+			text_shaped = shape_text(text_unshaped)
+			frame_img   = session.render(text_shaped)
+
+			expected_img = awti.create_img_of_sentence(
+				sentence_string    = text_shaped,
+				font_path          = font_path,
+				font_size          = font_size,
+				line_img_cache     = None,
+				fallback_font_path = case_fallback_font_path,
+				**case["params"]
+				)
+
+			frames.append((frame_img, expected_img, dict(session.frame_stats)))
+
+		rendered[name] = frames
+
+	return rendered
+
+def check_session_cases(font_path, fallback_font_path = None) :
+
+	# Returns {case name : result} for every frame of every session
+	# A frame fails if it isn't identical to create_img_of_sentence() or didn't re-render what was expected
+
+	results = {}
+
+	for font_size in FONT_SIZES :
+		for name, frames in render_session_cases(font_path, font_size, fallback_font_path = fallback_font_path).items() :
+			for i, (frame_img, expected_img, frame_stats) in enumerate(frames) :
+				expected_frame_stats = SESSION_CASES[name]["frames"][i][2]
+				n_diff_pixels, _     = compare_img_with_golden_img(frame_img, expected_img)
+
+				unexpected_frame_stats = {k : (frame_stats[k], v) for k, v in expected_frame_stats.items() if frame_stats[k] != v}
+
+				if n_diff_pixels :
+					status = "different from create_img_of_sentence"
+
+				elif unexpected_frame_stats :
+					status = "unexpected frame stats"
+
+				else :
+					status = "ok"
+
+				results[f"{name}_{font_size}_{i}"] = {
+					"status"                 : status,
+					"n_diff_pixels"          : n_diff_pixels,
+					"unexpected_frame_stats" : unexpected_frame_stats,
+				}
+
+	return results
+
+def check_glyph_coverage_cases(font_path, fallback_font_path = None) :
+
+	# Returns {case name : result}
+	# Renders with check_glyph_coverage = True through every function that accepts it
+	# A sentence that the fonts can draw must be identical to the one rendered without the check
+	# A sentence with a character that no font can draw must raise a ValueError
+
+	font_size   = min(FONT_SIZES)
+	text_shaped = shape_text(CORPUS["sentence_short"])
+
+	def render_sentence(text, check_glyph_coverage) :
+		return awti.create_img_of_sentence(
+			sentence_string      = text,
+			font_path            = font_path,
+			font_size            = font_size,
+			line_img_cache       = None,
+			fallback_font_path   = fallback_font_path,
+			check_glyph_coverage = check_glyph_coverage
+			)
+
+	def render_fit(text, check_glyph_coverage) :
+		return awti.fit_img_of_sentence_in_box(
+			sentence_string      = text,
+			font_path            = font_path,
+			box_wh               = (400, 80),
+			n_lines              = 1,
+			line_img_cache       = None,
+			fallback_font_path   = fallback_font_path,
+			check_glyph_coverage = check_glyph_coverage
+			)["img"]
+
+	def render_session(text, check_glyph_coverage) :
+		session = awti.ArabicSentenceRenderSession(
+			font_path            = font_path,
+			font_size            = font_size,
+			fallback_font_path   = fallback_font_path,
+			check_glyph_coverage = check_glyph_coverage
+			)
+
+		return session.render(text)
+
+	# The corpus sentence is only expected to be drawn if the fonts given can draw it
+	all_text = {
+		"covered"   : (text_shaped, not awti.find_uncovered_characters(text_shaped, font_path = font_path, fallback_font_path = fallback_font_path)),
+		"uncovered" : (f"{text_shaped} {UNCOVERED_CHARACTER}", False),
+	}
+
+	results = {}
+
+	for render_name, render in [("sentence", render_sentence), ("fit", render_fit), ("session", render_session)] :
+		for text_name, (text, expected_drawn) in all_text.items() :
+			try :
+				img    = render(text, check_glyph_coverage = True)
+				raised = None
+
+			except ValueError as e :
+				img    = None
+				raised = str(e)
+
+			if not expected_drawn :
+				status = "ok" if (raised is not None) and raised.startswith("Font can't draw") else "not refused"
+
+			elif img is None :
+				status = "refused"
+
+			else :
+				status = "ok" if compare_img_with_golden_img(img, render(text, check_glyph_coverage = False))[0] == 0 else "different from render without check"
+
+			results[f"coverage_{render_name}_{text_name}"] = {"status" : status, "error" : raised}
+
+	return results
+
+def check_line_img_cache_cases(font_path) :
+
+	# Returns {case name : result}
+	# Every sentence rendered twice with a fresh LineImgCache must hit once per line the second time (and miss none)
+	# A cache too small for the lines of a sentence must evict and stay within max_bytes, without changing any pixel
+
+	results = {}
+
+	for font_size in FONT_SIZES :
+		for name in SENTENCE_RENDER_PARAMS :
+			for i, params in enumerate(SENTENCE_RENDER_PARAMS[name]) :
+				line_img_cache = awti.LineImgCache()
+				all_stats      = []
+
+				for _ in range(2) :
+					awti.create_img_of_sentence(
+						sentence_string = shape_text(CORPUS[name]),
+						font_path       = font_path,
+						font_size       = font_size,
+						line_img_cache  = line_img_cache,
+						**params
+						)
+
+					all_stats.append(line_img_cache.stats())
+
+				n_hits   = all_stats[1]["hits"] - all_stats[0]["hits"]
+				n_misses = all_stats[1]["misses"] - all_stats[0]["misses"]
+
+				results[f"line_img_cache_{name}_{font_size}_{i}"] = {
+					"status" : "ok" if (n_hits == params["n_lines"]) and (n_misses == 0) else "unexpected hits or misses",
+					"error"  : None if (n_hits == params["n_lines"]) and (n_misses == 0) else f"{n_hits} hits and {n_misses} misses for {params['n_lines']} lines",
+				}
+
+	# Room for the biggest line only
+	font_size   = max(FONT_SIZES)
+	params      = SENTENCE_RENDER_PARAMS["sentence_long"][0]
+	text_shaped = shape_text(CORPUS["sentence_long"])
+
+	unbounded_line_img_cache = awti.LineImgCache()
+	expected_img             = awti.create_img_of_sentence(sentence_string = text_shaped, font_path = font_path, font_size = font_size, line_img_cache = unbounded_line_img_cache, **params)
+
+	max_bytes      = max(awti.LineImgCache.calculate_n_bytes_of_img(j) for j in unbounded_line_img_cache.line_img.values())
+	line_img_cache = awti.LineImgCache(max_bytes = max_bytes)
+
+	for _ in range(2) :
+		img = awti.create_img_of_sentence(sentence_string = text_shaped, font_path = font_path, font_size = font_size, line_img_cache = line_img_cache, **params)
+
+	stats = line_img_cache.stats()
+
+	if compare_img_with_golden_img(img, expected_img)[0] :
+		status = "different from unbounded cache"
+
+	elif not stats["evictions"] :
+		status = "nothing evicted"
+
+	elif stats["n_bytes"] > max_bytes :
+		status = "more bytes than max_bytes"
+
+	else :
+		status = "ok"
+
+	results["line_img_cache_small_max_bytes"] = {"status" : status, "error" : None if status == "ok" else str(stats)}
+
+	return results
+
+def check_glyph_cache_cases(font_path) :
+
+	# Returns {case name : result}
+	# Checks the roles of the caches rendered with in render_corpus()
+	# And that a cache used with another font size is refused (instead of rendering wrong glyphs)
+
+	results   = {}
+	font_size = min(FONT_SIZES)
+
+	owner_glyph_cache, attached_glyph_cache = create_owner_and_attached_glyph_caches(font_path, font_size)
+
+	try :
+		roles = [owner_glyph_cache.role, attached_glyph_cache.role]
+		results["glyph_cache_roles"] = {"status" : "ok" if roles == ["owner", "attached"] else "unexpected roles", "error" : None if roles == ["owner", "attached"] else str(roles)}
+
+		try :
+			awti.create_img_of_sentence(
+				sentence_string = shape_text(CORPUS["sentence_short"]),
+				font_path       = font_path,
+				font_size       = max(FONT_SIZES),
+				line_img_cache  = None,
+				glyph_cache     = attached_glyph_cache
+				)
+
+			results["glyph_cache_mismatched_font_size"] = {"status" : "not refused", "error" : None}
+
+		except ValueError as e :
+			results["glyph_cache_mismatched_font_size"] = {"status" : "ok", "error" : str(e)}
+
+	finally :
+		attached_glyph_cache.close()
+		owner_glyph_cache.unlink()
+
+	return results
+
+def time_stage(stage, repeats) :
+
+	# Returns the fastest run (in seconds)
+	all_t = []
+
+	for _ in range(repeats) :
+		t = time.perf_counter()
+		stage()
+		all_t.append(time.perf_counter() - t)
+
+	return min(all_t)
+
+def time_calibration(font_path, repeats = DEFAULT_TIMING_REPEATS) :
+
+	# Times a fixed workload that doesn't use the renderer (only Python and Pillow)
+	# Timings are divided by it, so that a slower (or busier) machine isn't taken for a regression
+
+	font = ImageFont.truetype(font_path, max(FONT_SIZES))
+
+	def calibration() :
+		img  = Image.new("L", (512, 128), 0)
+		draw = ImageDraw.Draw(img)
+
+		for i in range(20) :
+			draw.text((i, 0), "The quick brown fox", font = font, fill = 255)
+
+		sum(i * i for i in range(20000))
+
+	return time_stage(calibration, repeats)
+
+def time_stages(font_path, repeats = DEFAULT_TIMING_REPEATS) :
+
+	# Times each stage of the renderer separately
+	# So that a regression can be traced back to the stage that caused it
+
+	font_size   = max(FONT_SIZES)
+	font        = ImageFont.truetype(font_path, font_size)
+	text_shaped = shape_text(CORPUS["sentence_long"])
+	words       = text_shaped.split(" ")
+
+	# Images of vowels are the images that are cropped by the renderer
+	obj_with_vowels = awti.ArabicWord(
+		word_string                         = shape_text(CORPUS["word_shadda"]),
+		font_path                           = font_path,
+		font_size                           = font_size,
+		cached_unique_alphabets_wh_and_bbox = {},
+		cached_unique_vowels_img            = {}
+		)
+
+	uncropped_vowels_img = []
+
+	for v, vowel_img in obj_with_vowels.unique_vowels_img.items() :
+		(text_w, text_h), (left, top, right, bottom) = awti.calculate_wh_and_bbox_of_rendered_text(text = v, font = font)
+
+		# Big enough to hold the whole vowel, like in ArabicWord.create_img_of_each_different_vowels()
+		uncropped_img = Image.new("RGBA", (text_w, text_h), awti.RGBA_TRANSPARENT)
+		uncropped_img.paste(vowel_img, (0, 0))
+		uncropped_vowels_img.append(uncropped_img)
+
+	def stage_measure() :
+		for i in words :
+			awti.calculate_wh_and_bbox_of_rendered_text(text = i, font = font)
+
+	def stage_crop() :
+		for i in uncropped_vowels_img :
+			awti.calculate_box_to_crop_out_whitespace_from_img(img = i)
+
+	def stage_words() :
+		cached_unique_alphabets_wh_and_bbox = {}
+		cached_unique_vowels_img            = {}
+
+		for i in words :
+			awti.ArabicWord(
+				word_string                         = i,
+				font_path                           = font_path,
+				font_size                           = font_size,
+				img_background_rgba                 = awti.RGBA_TRANSPARENT,
+				cached_unique_alphabets_wh_and_bbox = cached_unique_alphabets_wh_and_bbox,
+				cached_unique_vowels_img            = cached_unique_vowels_img
+				)
+
+	def stage_sentence() :
+		awti.create_img_of_sentence(
+			sentence_string = text_shaped,
+			font_path       = font_path,
+			font_size       = font_size,
+			n_lines         = 4,
+			line_spacing    = 10,
+			line_img_cache  = None
+			)
+
+	stages = {
+		"measure"  : stage_measure,
+		"crop"     : stage_crop,
+		"words"    : stage_words,
+		"sentence" : stage_sentence,
+	}
+
+	return {name : time_stage(stage, repeats) for name, stage in stages.items()}
+
+def warm_up_glyph_cache_in_worker(font_path, font_size, shared) :
+
+	# Runs in a worker process
+	# Returns how long it took to get a warm glyph cache and how much private memory it takes
+
+	# Plugins of PIL are loaded on first use, not measured as part of the cache
+	Image.init()
+
+	tracemalloc.start()
+
+	glyph_cache = awti.SharedGlyphCache(font_path = font_path, font_size = font_size, shared = shared)
+
+	# Python objects (dimensions, dictionaries, ...) + pixels of images of vowels (allocated by PIL, not seen by tracemalloc)
+	n_bytes = tracemalloc.get_traced_memory()[0] + glyph_cache.calculate_n_bytes_of_private_imgs()
+	tracemalloc.stop()
+
+	result = {
+		"role"                  : glyph_cache.role,
+		"warm_up_s"             : glyph_cache.warm_up_s,
+		"n_bytes_private"       : n_bytes,
+		"n_bytes_shared_memory" : glyph_cache.calculate_n_bytes_of_shared_memory(),
+	}
+
+	glyph_cache.close()
+
+	return result
+
+def measure_shared_glyph_cache(font_path, n_workers, font_size = max(FONT_SIZES)) :
+
+	# Compares N workers each warming up their own glyph cache against N workers sharing one
+	# Workers are started with "spawn" so that nothing is inherited from this process
+
+	context = multiprocessing.get_context("spawn")
+	results = {}
+
+	for shared in [False, True] :
+
+		# Starts from an empty shared memory
+		awti.SharedGlyphCache(font_path = font_path, font_size = font_size, shared = False).unlink()
+
+		with context.Pool(processes = n_workers) as pool :
+			all_worker = pool.starmap(warm_up_glyph_cache_in_worker, [(font_path, font_size, shared)] * n_workers)
+
+		awti.SharedGlyphCache(font_path = font_path, font_size = font_size, shared = False).unlink()
+
+		# The shared memory segment exists once, no matter how many workers attach to it
+		n_bytes_shared_memory = max(i["n_bytes_shared_memory"] for i in all_worker)
+
+		results["shared" if shared else "local"] = {
+			"roles"           : [i["role"] for i in all_worker],
+			"warm_up_s_total" : sum(i["warm_up_s"] for i in all_worker),
+			"warm_up_s_max"   : max(i["warm_up_s"] for i in all_worker),
+			"n_bytes_total"   : sum(i["n_bytes_private"] for i in all_worker) + n_bytes_shared_memory,
+		}
+
+	results["warm_up_s_saved"] = results["local"]["warm_up_s_total"] - results["shared"]["warm_up_s_total"]
+	results["n_bytes_saved"]   = results["local"]["n_bytes_total"] - results["shared"]["n_bytes_total"]
+
+	return results
+
+def measure_multi_size_rendering(font_path, font_sizes, repeats = DEFAULT_TIMING_REPEATS) :
+
+	# Compares create_imgs_of_sentence_in_sizes() against one create_img_of_sentence() per font size
+	# Also checks that both create identical images
+
+	text_shaped = shape_text(CORPUS["sentence_long"])
+	params      = {"n_lines" : 4, "line_spacing" : 10, "line_img_cache" : None}
+
+	def independent_calls() :
+		return {i : awti.create_img_of_sentence(sentence_string = text_shaped, font_path = font_path, font_size = i, **params) for i in font_sizes}
+
+	def multi_size_call() :
+		return awti.create_imgs_of_sentence_in_sizes(sentence_string = text_shaped, font_path = font_path, font_sizes = font_sizes, **params)
+
+	all_independent_img = independent_calls()
+	all_multi_size_img  = multi_size_call()
+
+	identical = all(compare_img_with_golden_img(all_multi_size_img[i], all_independent_img[i])[0] == 0 for i in font_sizes)
+
+	independent_s = time_stage(independent_calls, repeats)
+	multi_size_s  = time_stage(multi_size_call, repeats)
+
+	return {
+		"font_sizes"    : font_sizes,
+		"identical"     : identical,
+		"independent_s" : independent_s,
+		"multi_size_s"  : multi_size_s,
+		"speedup"       : independent_s / multi_size_s if multi_size_s else float("inf"),
+		"n_cpus"        : os.cpu_count(),
+	}
+
+def compare_img_with_golden_img(img, golden_img) :
+
+	# Returns (number of different pixels, diff image)
+	# The diff image is None when the images are identical
+
+	if (img.mode != golden_img.mode) or (img.size != golden_img.size) :
+		return (-1, None)
+
+	diff_img = ImageChops.difference(img, golden_img)
+
+	# No pixel is different
+	if diff_img.getbbox(alpha_only = False) is None :
+		return (0, None)
+
+	# Marks pixels that differ in at least one channel
+	# (Converting to "L" would hide differences in the alpha channel)
+	mask_img = diff_img.getchannel(0)
+
+	for i in diff_img.getbands()[1:] :
+		mask_img = ImageChops.lighter(mask_img, diff_img.getchannel(i))
+
+	mask_img      = mask_img.point(lambda i : 255 if i else 0)
+	n_diff_pixels = mask_img.histogram()[255]
+
+	# Highlights the different pixels in red on top of the golden image
+	highlighted_img = golden_img.convert("RGBA")
+	highlighted_img.paste((255, 0, 0, 255), (0, 0), mask = mask_img)
+
+	return (n_diff_pixels, highlighted_img)
+
+def update_golden_imgs_and_baseline(font_path, regression_dir, repeats = DEFAULT_BASELINE_REPEATS, fallback_font_path = None) :
+
+	golden_dir = os.path.join(regression_dir, "golden")
+	os.makedirs(golden_dir, exist_ok = True)
+
+	for name, img in render_corpus(font_path, fallback_font_path = fallback_font_path).items() :
+
+		# Compared to the golden image of another case
+		if find_golden_img_name(name) != name :
+			continue
+
+		img.save(os.path.join(golden_dir, f"{name}.png"))
+
+	baseline = {
+		"font_name"            : os.path.basename(font_path),
+		"font_sha256"          : awti.calculate_sha256_of_file(font_path),
+		"fallback_font_name"   : os.path.basename(fallback_font_path) if fallback_font_path is not None else None,
+		"fallback_font_sha256" : awti.calculate_sha256_of_file(fallback_font_path) if fallback_font_path is not None else None,
+		"pillow_version"       : PIL.__version__,
+		"calibration"          : time_calibration(font_path, repeats = repeats),
+		"timings"              : time_stages(font_path, repeats = repeats),
+	}
+
+	with open(os.path.join(regression_dir, "baseline.json"), "w", encoding = "utf-8") as f :
+		json.dump(baseline, f, indent = 4)
+
+	return baseline
+
+def check_against_golden_imgs_and_baseline(font_path, regression_dir, threshold = DEFAULT_SLOWDOWN_THRESHOLD, repeats = DEFAULT_TIMING_REPEATS, check_timings = True, strict = False, fallback_font_path = None) :
+
+	# Returns the report (dict), which is also written to <regression_dir>/report
+	# report["passed"] is False if any image differs (or any stage is too slow, when strict)
+
+	golden_dir    = os.path.join(regression_dir, "golden")
+	report_dir    = os.path.join(regression_dir, "report")
+	baseline_path = os.path.join(regression_dir, "baseline.json")
+
+	if not os.path.exists(baseline_path) :
+		raise FileNotFoundError(f"No baseline found in {regression_dir}, run with --update first to store golden images and baseline")
+
+	os.makedirs(report_dir, exist_ok = True)
+
+	with open(baseline_path, "r", encoding = "utf-8") as f :
+		baseline = json.load(f)
+
+	report = {
+		"passed"   : True,
+		"warnings" : [],
+		"images"   : {},
+		"sessions" : {},
+		"fits"     : {},
+		"coverage" : {},
+		"caches"   : {},
+		"timings"  : {},
+	}
+
+	# Golden images are only valid for the font (and rasteriser) they were created with
+	if awti.calculate_sha256_of_file(font_path) != baseline["font_sha256"] :
+		report["passed"] = False
+		report["warnings"].append(f"Font {font_path} is not the font the golden images were created with ({baseline['font_name']})")
+
+	if (fallback_font_path is not None) and (awti.calculate_sha256_of_file(fallback_font_path) != baseline.get("fallback_font_sha256")) :
+		report["passed"] = False
+		report["warnings"].append(f"Fallback font {fallback_font_path} is not the fallback font the golden images were created with ({baseline.get('fallback_font_name')})")
+
+	if PIL.__version__ != baseline["pillow_version"] :
+		report["warnings"].append(f"Pillow {PIL.__version__} is used but golden images were created with Pillow {baseline['pillow_version']}")
+
+	# Compares pixels
+	for name, img in render_corpus(font_path, fallback_font_path = fallback_font_path).items() :
+		golden_img_path = os.path.join(golden_dir, f"{find_golden_img_name(name)}.png")
+
+		if not os.path.exists(golden_img_path) :
+			report["passed"] = False
+			report["images"][name] = {"status" : "missing golden image"}
+			continue
+
+		with Image.open(golden_img_path) as golden_img :
+			golden_img.load()
+			n_diff_pixels, highlighted_img = compare_img_with_golden_img(img, golden_img)
+
+			if n_diff_pixels == 0 :
+				report["images"][name] = {"status" : "identical"}
+				continue
+
+			report["passed"] = False
+
+			# Keeps the rendered image so that it can be inspected (and promoted to golden image)
+			img.save(os.path.join(report_dir, f"{name}.actual.png"))
+
+			if n_diff_pixels < 0 :
+				report["images"][name] = {
+					"status"        : "different size or mode",
+					"size"          : img.size,
+					"golden_size"   : golden_img.size,
+					"mode"          : img.mode,
+					"golden_mode"   : golden_img.mode,
+				}
+
+			else :
+				highlighted_img.save(os.path.join(report_dir, f"{name}.diff.png"))
+
+				report["images"][name] = {
+					"status"        : "different pixels",
+					"n_diff_pixels" : n_diff_pixels,
+				}
+
+	# Checks that sessions only re-render what changed, and still render the same pixels
+	report["sessions"] = check_session_cases(font_path, fallback_font_path = fallback_font_path)
+
+	if any(i["status"] != "ok" for i in report["sessions"].values()) :
+		report["passed"] = False
+
+	# Checks that fitting measures the size of the image correctly, and finds the largest font size
+	report["fits"] = check_fit_cases(font_path, fallback_font_path = fallback_font_path)
+
+	if any(i["status"] != "ok" for i in report["fits"].values()) :
+		report["passed"] = False
+
+	# Checks that check_glyph_coverage refuses characters that no font can draw, and changes nothing otherwise
+	report["coverage"] = check_glyph_coverage_cases(font_path, fallback_font_path = fallback_font_path)
+
+	if any(i["status"] != "ok" for i in report["coverage"].values()) :
+		report["passed"] = False
+
+	# Checks the caches used by the cases above
+	report["caches"] = {**check_line_img_cache_cases(font_path), **check_glyph_cache_cases(font_path)}
+
+	if any(i["status"] != "ok" for i in report["caches"].values()) :
+		report["passed"] = False
+
+	# Compares timings
+	if check_timings :
+
+		# Ratio of the speed of this machine to the speed of the machine the baseline was timed on
+		# Baselines stored before calibration existed are compared as is
+		speed_ratio = 1.0
+
+		if baseline.get("calibration") :
+			speed_ratio = time_calibration(font_path, repeats = repeats) / baseline["calibration"]
+
+		for name, t in time_stages(font_path, repeats = repeats).items() :
+			baseline_t = baseline["timings"].get(name)
+
+			if baseline_t is None :
+				report["timings"][name] = {"status" : "no baseline", "seconds" : t}
+				continue
+
+			ratio  = (t / speed_ratio) / baseline_t if baseline_t else float("inf")
+			status = "ok"
+
+			if ratio > threshold :
+				status = "slower"
+				report["warnings"].append(f"Stage {name} is x{ratio:.2f} slower than its baseline (threshold = x{threshold:.2f})")
+
+				if strict :
+					report["passed"] = False
+
+			report["timings"][name] = {
+				"status"           : status,
+				"seconds"          : t,
+				"baseline_seconds" : baseline_t,
+				"speed_ratio"      : speed_ratio,
+				"ratio"            : ratio,
+			}
+
+	with open(os.path.join(report_dir, "report.json"), "w", encoding = "utf-8") as f :
+		json.dump(report, f, indent = 4)
+
+	return report
+
+def print_report(report) :
+
+	for i in report["warnings"] :
+		print(f"WARNING: {i}")
+
+	for name, result in report["images"].items() :
+		if result["status"] != "identical" :
+			print(f"Image {name:<32} {result['status']} {result.get('n_diff_pixels', '')}")
+
+	for name, result in report["sessions"].items() :
+		if result["status"] != "ok" :
+			print(f"Session {name:<30} {result['status']} {result['unexpected_frame_stats'] or result['n_diff_pixels']}")
+
+	for name, result in report["fits"].items() :
+		if result["status"] != "ok" :
+			print(f"Fit {name:<34} {result['status']} (font size = {result['font_size']}, wh = {result['wh']}, image = {result['img_wh']})")
+
+	for name, result in report["coverage"].items() :
+		if result["status"] != "ok" :
+			print(f"Coverage {name:<29} {result['status']} {result['error'] or ''}")
+
+	for name, result in report["caches"].items() :
+		if result["status"] != "ok" :
+			print(f"Cache {name:<32} {result['status']} {result['error'] or ''}")
+
+	for name, result in report["timings"].items() :
+		if "ratio" in result :
+			print(f"Stage {name:<10} {result['seconds'] * 1000:>10.2f} ms (baseline = {result['baseline_seconds'] * 1000:.2f} ms, machine x{result['speed_ratio']:.2f}, x{result['ratio']:.2f}) {result['status']}")
+
+		else :
+			print(f"Stage {name:<10} {result['seconds'] * 1000:>10.2f} ms {result['status']}")
+
+	print(f"\n{'PASSED' if report['passed'] else 'FAILED'}")
+
+if __name__ == "__main__" :
+
+	parser = argparse.ArgumentParser(description = "Compares rendered images against golden images and times each stage against a baseline")
+	parser.add_argument("--font-path",      required = True,                      help = "path to locally installed font (.ttf)")
+	parser.add_argument("--fallback-font-path", default = None,                   help = "path to a font (.ttf) that draws characters missing from --font-path (enables fallback cases)")
+	parser.add_argument("--regression-dir", default  = DEFAULT_REGRESSION_DIR,    help = "where golden images, baseline and report are stored")
+	parser.add_argument("--threshold",      type     = float, default = DEFAULT_SLOWDOWN_THRESHOLD, help = "max allowed ratio of stage time to baseline time")
+	parser.add_argument("--repeats",        type     = int,   default = DEFAULT_TIMING_REPEATS,     help = "number of times each stage is timed")
+	parser.add_argument("--baseline-repeats", type   = int,   default = DEFAULT_BASELINE_REPEATS,   help = "number of times each stage is timed for the baseline (with --update)")
+	parser.add_argument("--strict",         action   = "store_true",              help = "fails if a stage is slower than its baseline (otherwise only warns)")
+	parser.add_argument("--update",         action   = "store_true",              help = "stores new golden images and baseline instead of checking")
+	parser.add_argument("--skip-timings",   action   = "store_true",              help = "only compares pixels")
+	parser.add_argument("--shared-glyph-cache-workers", type = int, default = 0,  help = "only measures warm-up time and memory saved by SharedGlyphCache with this many workers")
+	parser.add_argument("--multi-size",     default  = "",                        help = "only times create_imgs_of_sentence_in_sizes() against one call per font size (i.e. 16,32,64,128)")
+	args = parser.parse_args()
+
+	if args.multi_size :
+		results = measure_multi_size_rendering(args.font_path, font_sizes = [int(i) for i in args.multi_size.split(",")], repeats = args.repeats)
+
+		print(f"Font sizes            : {results['font_sizes']} ({results['n_cpus']} CPUs)")
+		print(f"Independent calls     : {results['independent_s'] * 1000:>8.2f} ms ({len(results['font_sizes'])} calls)")
+		print(f"Multi-size call       : {results['multi_size_s'] * 1000:>8.2f} ms (x{results['speedup']:.2f})")
+		print(f"Identical images      : {results['identical']}")
+
+		sys.exit(0 if results["identical"] else 1)
+
+	if args.shared_glyph_cache_workers :
+		results = measure_shared_glyph_cache(args.font_path, n_workers = args.shared_glyph_cache_workers)
+
+		for mode in ["local", "shared"] :
+			print(f"{mode:<6} : warm-up = {results[mode]['warm_up_s_total'] * 1000:>8.2f} ms (total), {results[mode]['warm_up_s_max'] * 1000:>8.2f} ms (slowest worker), memory = {results[mode]['n_bytes_total']:>10} bytes, roles = {results[mode]['roles']}")
+
+		print(f"\nSaved with {args.shared_glyph_cache_workers} workers : {results['warm_up_s_saved'] * 1000:.2f} ms of warm-up, {results['n_bytes_saved']} bytes")
+
+		sys.exit(0)
+
+	if args.update :
+		baseline = update_golden_imgs_and_baseline(args.font_path, args.regression_dir, repeats = args.baseline_repeats, fallback_font_path = args.fallback_font_path)
+		print(f"Stored golden images and baseline in {args.regression_dir}")
+
+		for name, t in baseline["timings"].items() :
+			print(f"Stage {name:<10} {t * 1000:>10.2f} ms")
+
+		sys.exit(0)
+
+	try :
+		report = check_against_golden_imgs_and_baseline(
+			font_path          = args.font_path,
+			regression_dir     = args.regression_dir,
+			threshold          = args.threshold,
+			repeats            = args.repeats,
+			check_timings      = not args.skip_timings,
+			strict             = args.strict,
+			fallback_font_path = args.fallback_font_path
+			)
+
+	except FileNotFoundError as e :
+		print(e)
+		sys.exit(2)
+
+	print_report(report)
+
+	sys.exit(0 if report["passed"] else 1)